@@ -1,3 +1,4 @@
+from datetime import datetime
 from functools import lru_cache
 
 from pydantic_settings import BaseSettings
@@ -7,9 +8,31 @@ class Settings(BaseSettings):
     # 数据库配置
     DB_HOST: str = "localhost"
     DB_PORT: int = 3306
-    DB_USER: str
-    DB_PASSWORD: str
+    DB_USER: str = ""
+    DB_PASSWORD: str = ""
     DB_NAME: str = "student_course_system"
+    DB_CONNECT_TIMEOUT: int = 5  # 建立连接的超时秒数
+    # MySQL 驱动：mysqlconnector、pymysql（纯 Python）或 mysqldb（mysqlclient，C 扩展）
+    DB_DRIVER: str = "mysqlconnector"
+    # 完整的数据库连接URL，设置后优先于上面的 MySQL 配置（例如本地 SQLite）
+    DATABASE_URL: str | None = None
+
+    # 选课记录分片，按 student_id 取模分布到这些数据库；为空时选课记录保存在主库
+    ENROLLMENT_SHARD_URLS: list = []
+
+    # 数据库连接池配置
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # 获取连接的最长等待秒数
+    DB_POOL_RECYCLE: int = 3600  # 连接回收秒数，应小于 MySQL 的 wait_timeout
+    DB_POOL_PRE_PING: bool = True
+
+    # 只读副本配置
+    DB_REPLICA_URLS: list = []
+    DB_REPLICA_RETRY_SECONDS: int = 30  # 副本故障后重新尝试的间隔秒数
+    DB_REPLICA_CONNECT_TIMEOUT: int = 2  # 连接副本的超时秒数，超时后改读主库
+    DB_REPLICA_POOL_TIMEOUT: int = 3  # 等待副本连接池空闲连接的最长秒数
+    DB_READ_YOUR_WRITES_SECONDS: int = 5  # 写入后读请求走主库的秒数，0 表示关闭
 
     # JWT配置
     SECRET_KEY: str
@@ -26,6 +49,78 @@ class Settings(BaseSettings):
     ALLOW_METHODS: list = ["*"]
     ALLOW_HEADERS: list = ["*"]
 
+    # 选课模式配置：fcfs 为先到先得，lottery 为志愿抽签
+    SELECTION_MODE: str = "fcfs"
+    PREFERENCE_WINDOW_START: datetime | None = None
+    PREFERENCE_WINDOW_END: datetime | None = None
+    MAX_PREFERENCES: int = 10
+    MAX_BATCH_STUDENT_IDS: int = 1000  # 批量查询课程表时一次最多传入的学生 ID 数
+
+    # SQL 性能分析配置
+    SQL_PROFILER_ENABLED: bool = False
+    SQL_PROFILER_REPEAT_THRESHOLD: int = 5  # 同一语句在一次请求中的重复次数阈值
+    SQL_PROFILER_HISTORY: int = 200  # 滚动报告保留的最近请求数
+    # 路由查询预算，如 {"GET /api/courses": 3}
+    SQL_PROFILER_QUERY_BUDGETS: dict = {}
+    SQL_PROFILER_STRICT: bool = False  # 超出预算时直接返回错误，用于测试
+
+    # 慢查询日志配置，阈值不大于 0 时关闭
+    SLOW_QUERY_THRESHOLD_MS: float = 200
+    SLOW_QUERY_LOG_SIZE: int = 100  # 环形缓冲区保留的慢查询条数
+    SLOW_QUERY_EXPLAIN: bool = True  # 是否为慢 SELECT 采集执行计划
+
+    # 请求链路追踪配置，采样率为 0 时关闭
+    TRACING_SAMPLE_RATE: float = 0.0
+    TRACING_BUFFER_SIZE: int = 200  # 内存中保留的最近 trace 数
+    TRACING_FILE: str | None = None  # 设置后以 OTLP/JSON Lines 格式追加写入该文件
+
+    # 当前学期，读接口默认只返回该学期的课程；未设置时返回全部未归档的课程
+    ACTIVE_ACADEMIC_YEAR: int | None = None
+    ACTIVE_SEMESTER: int | None = None
+
+    # 学期归档配置
+    ARCHIVE_BATCH_SIZE: int = 100  # 每个事务归档的课程数
+    ARCHIVE_BATCH_PAUSE: float = 0.1  # 两批之间的间隔秒数，减少对线上请求的影响
+
+    # 后台任务配置
+    JOB_WORKERS: int = 2  # 同时执行的后台任务数
+    JOB_BATCH_SIZE: int = 500  # 任务中每个事务处理的行数
+    JOB_HEARTBEAT_INTERVAL: int = 10  # 执行进程更新任务心跳的间隔秒数
+    JOB_HEARTBEAT_TIMEOUT: int = 60  # 心跳超过该秒数未更新的任务视为中断
+
+    # 课程目录快照配置
+    CATALOG_CHECK_INTERVAL: float = 1.0  # 检查目录版本号的最短间隔（秒）
+
+    # 合并并发相同 GET 请求的路径，只应包含响应与具体用户无关的路由，空列表表示关闭
+    SINGLE_FLIGHT_PATHS: list = ["/api/courses", "/api/classrooms"]
+
+    # 过载保护配置
+    THREADPOOL_SIZE: int = 0  # 同步路由线程池大小，0 表示取连接池最大连接数
+    ADMISSION_ENABLED: bool = True
+    # 覆盖各类路由的并发上限和排队长度，如 {"enrollment": {"concurrency": 10, "queue": 100}}
+    ADMISSION_LIMITS: dict = {}
+    ADMISSION_QUEUE_TIMEOUT: float = 5.0  # 排队的最长等待秒数，超时返回 503
+    ADMISSION_RETRY_AFTER: int = 1  # 503 响应中 Retry-After 的秒数
+
+    # 剩余名额推送配置
+    SEAT_BROADCAST_INTERVAL: float = 1.0  # 合并推送的周期（秒）
+    SSE_KEEPALIVE_SECONDS: float = 15.0  # 无变化时发送心跳的间隔（秒）
+
+    # 日志配置
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: str | None = None  # 设置后同时写入该文件
+    LOG_QUEUE_SIZE: int = 10000  # 日志队列长度，队列满时丢弃新日志
+    ACCESS_LOG_ENABLED: bool = True
+
+    # 选课审计日志配置
+    AUDIT_BATCH_SIZE: int = 500  # 每批写入数据库的最大条数
+    AUDIT_FLUSH_INTERVAL: float = 1.0  # 两次批量写入的最长间隔（秒）
+    AUDIT_QUEUE_SIZE: int = 100000
+
+    # 监控指标配置
+    METRICS_ENABLED: bool = True
+    AUTH_TOKEN_CACHE_SIZE: int = 10000  # 已验证令牌的缓存条数，0 表示不缓存
+
     class Config:
         env_file = ".env"
         case_sensitive = True
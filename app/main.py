@@ -1,27 +1,176 @@
+import logging
+import time
+from collections import Counter
 from contextlib import asynccontextmanager
 
 from fastapi import Depends, FastAPI, Request
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from app.routers import auth, classrooms, courses, schedules, students
+from app.config import get_settings
+from app.routers import (
+    admin,
+    auth,
+    classrooms,
+    courses,
+    jobs,
+    preferences,
+    schedules,
+    students,
+)
+from app.utils.admission import AdmissionControlMiddleware, configure_threadpool
+from app.utils.audit import audit_writer
 from app.utils.auth import oauth2_scheme
-from app.utils.init_db import init_database
+from app.utils.catalog import catalog_store
+from app.utils.init_db import StartupReport, get_engine, init_database
+from app.utils.jobs import job_runner
+from app.utils.logger import setup_logging, shutdown_logging
+from app.utils.metrics import (
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+    UNHANDLED_EXCEPTIONS,
+    registry,
+)
+from app.utils.profiler import (
+    install_sql_profiler,
+    profile_report,
+    query_budget_for,
+    repeated_statements,
+)
+from app.utils.request_context import (
+    RequestContext,
+    reset_request_context,
+    route_template,
+    set_request_context,
+)
 from app.utils.response import response_error
+from app.utils.seats import seat_broadcaster
+from app.utils.single_flight import SingleFlightMiddleware
+from app.utils.slow_query import install_slow_query_log, record_request_slow_queries
+from app.utils.tracing import install_tracing, trace_exporter, trace_request
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("app.access")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    setup_logging()
+    threads = configure_threadpool()
+    logger.info(f"同步路由线程池大小: {threads}")
+    report = StartupReport()
     try:
-        init_database()
-        print("数据库初始化成功")
+        init_database(report)
+        with report.phase("加载课程目录"):
+            catalog_store.get()
+        interrupted = job_runner.recover(get_engine())
+        if interrupted:
+            logger.warning(f"{interrupted} 个后台任务因服务重启被中断")
+        logger.info("数据库初始化成功")
     except Exception as e:
-        print(f"警告: 数据库初始化失败，应用程序将在没有数据库的情况下运行: {str(e)}")
+        logger.warning(
+            f"数据库初始化失败，应用程序将在没有数据库的情况下运行: {str(e)}"
+        )
+
+    # 输出启动各阶段耗时
+    logger.info(
+        "启动完成",
+        extra={
+            "phases_ms": {
+                name: round(seconds * 1000, 1) for name, seconds in report.phases
+            },
+            "total_ms": round(report.total * 1000, 1),
+        },
+    )
+    seat_broadcaster.start()
     yield
+    await seat_broadcaster.stop()
+    job_runner.shutdown()
+    # 关闭前写完尚未落库的审计日志，最后写出队列中剩余的日志
+    audit_writer.stop()
+    shutdown_logging()
 
 
 app = FastAPI(title="学生选课系统", lifespan=lifespan)
 
+install_sql_profiler()
+install_slow_query_log()
+install_tracing()
+
+# 以下中间件先于请求上下文中间件注册，位于其内层，被合并或拒绝的请求仍各自
+# 记录访问日志和指标。过载保护位于请求合并之内，只有实际执行的请求占用名额
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+if settings.SINGLE_FLIGHT_PATHS:
+    app.add_middleware(SingleFlightMiddleware, paths=settings.SINGLE_FLIGHT_PATHS)
+
+
+@app.middleware("http")
+async def request_context_middleware(request: Request, call_next):
+    context = RequestContext(request.method, request.url.path)
+    if settings.SQL_PROFILER_ENABLED:
+        context.statements = Counter()
+    token = set_request_context(context)
+    start = time.perf_counter()
+    status_code = 500
+    REQUESTS_IN_FLIGHT.inc()
+    try:
+        with trace_request(context, context.route_key) as root:
+            response = await call_next(request)
+            status_code = response.status_code
+            if root is not None:
+                root.attributes["http.status_code"] = status_code
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        reset_request_context(token)
+        context.route = route_template(request)
+        elapsed = time.perf_counter() - start
+        record_request_slow_queries(context)
+        if settings.ACCESS_LOG_ENABLED:
+            access_logger.info(
+                "request",
+                extra={
+                    "method": request.method,
+                    "path": request.url.path,
+                    "route": context.route_key,
+                    "user_id": context.user_id,
+                    "status": status_code,
+                    "latency_ms": round(elapsed * 1000, 3),
+                    "queries": context.query_count,
+                },
+            )
+        if context.trace is not None:
+            context.trace.root.name = context.route_key
+            trace_exporter.export(context.trace)
+        if settings.METRICS_ENABLED:
+            # 未匹配的路径统一归为 unmatched，避免标签数量无限增长
+            REQUEST_LATENCY.observe(
+                elapsed,
+                method=request.method,
+                route=context.route or "unmatched",
+                status=status_code,
+            )
+
+    if settings.SQL_PROFILER_ENABLED:
+        repeated = repeated_statements(context)
+        profile_report.record(context, repeated)
+        budget = query_budget_for(context)
+        if settings.SQL_PROFILER_STRICT and budget is not None:
+            if context.query_count > budget:
+                return response_error(
+                    code=500,
+                    message=f"{context.route_key} 执行了 {context.query_count} 条 SQL，"
+                    f"超出预算 {budget} 条",
+                )
+        response.headers["X-DB-Queries"] = str(context.query_count)
+        response.headers["X-DB-Time"] = f"{context.db_time * 1000:.3f}"
+    if context.trace is not None:
+        response.headers["X-Trace-Id"] = context.trace.trace_id
+    return response
+
 
 # 全局异常处理
 @app.exception_handler(StarletteHTTPException)
@@ -36,6 +185,8 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
+    UNHANDLED_EXCEPTIONS.inc(exception=type(exc).__name__)
+    logger.error("未处理的异常", exc_info=exc)
     return response_error(code=500, message=str(exc))
 
 
@@ -65,8 +216,36 @@ app.include_router(
     tags=["教室管理"],
     dependencies=[Depends(oauth2_scheme)],
 )
+app.include_router(
+    preferences.router,
+    prefix="/api",
+    tags=["志愿选课"],
+    dependencies=[Depends(oauth2_scheme)],
+)
+app.include_router(
+    jobs.router,
+    prefix="/api",
+    tags=["后台任务"],
+    dependencies=[Depends(oauth2_scheme)],
+)
+app.include_router(
+    admin.router,
+    prefix="/api",
+    tags=["系统管理"],
+    dependencies=[Depends(oauth2_scheme)],
+)
 
 
 @app.get("/")
 async def root():
     return {"message": "欢迎使用学生选课系统"}
+
+
+if settings.METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus 格式的监控指标"""
+        return PlainTextResponse(
+            registry.render(), media_type="text/plain; version=0.0.4"
+        )
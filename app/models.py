@@ -8,9 +8,13 @@ from sqlalchemy import (
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     String,
+    Text,
     Time,
+    UniqueConstraint,
+    func,
 )
 from sqlalchemy.orm import Session, relationship
 
@@ -78,6 +82,20 @@ class CourseModel(Base):
     teacher = Column(String(100))
     credits = Column(Integer)
     max_student_num = Column(Integer)
+    enrolled_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+        comment="已选人数，与选课记录在同一事务中维护",
+    )
+    closed = Column(
+        Boolean,
+        nullable=False,
+        default=False,
+        server_default="0",
+        comment="已关闭选课，删除中的课程不再接受选课",
+    )
     classroom_id = Column(Integer, ForeignKey("classrooms.id"), nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.datetime.now(timezone.utc))
     updated_at = Column(
@@ -97,6 +115,12 @@ class CourseModel(Base):
 
 class StudentCourseModel(Base):
     __tablename__ = "student_courses"
+    __table_args__ = (
+        Index(
+            "uq_student_courses_student_course", "student_id", "course_id", unique=True
+        ),
+        Index("ix_student_courses_course_id", "course_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id"))
@@ -111,6 +135,10 @@ class StudentCourseModel(Base):
 
 class CourseScheduleModel(Base):
     __tablename__ = "course_schedules"
+    __table_args__ = (
+        Index("ix_course_schedules_course_id", "course_id"),
+        Index("ix_course_schedules_weekday_start_time", "weekday", "start_time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     course_id = Column(Integer, ForeignKey("courses.id"))
@@ -121,6 +149,129 @@ class CourseScheduleModel(Base):
     course = relationship("CourseModel", back_populates="schedules")
 
 
+class CoursePreferenceModel(Base):
+    __tablename__ = "course_preferences"
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id"), index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
+    rank = Column(Integer, comment="志愿顺序，1 为第一志愿")
+    created_at = Column(DateTime, default=lambda: datetime.datetime.now(timezone.utc))
+
+
+class EnrollmentAuditModel(Base):
+    """选课审计日志，只追加不修改；不设外键，学生或课程删除后记录仍保留"""
+
+    __tablename__ = "enrollment_audit_logs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    action = Column(String(32), comment="操作类型，如 enroll、drop、delete_student")
+    student_id = Column(Integer, index=True)
+    course_id = Column(Integer, index=True)
+    operator_id = Column(Integer, comment="执行操作的用户 ID")
+    detail = Column(String(500))
+    created_at = Column(DateTime, default=lambda: datetime.datetime.now(timezone.utc))
+
+
+class CatalogVersionModel(Base):
+    """课程目录版本号，课程、时间安排或教室变化时加一，用于刷新内存中的目录快照"""
+
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=lambda: datetime.datetime.now(timezone.utc))
+
+
+class ArchivedCourseModel(Base):
+    """已归档学期的课程，沿用原课程 ID；不设外键，代码可被新学期的课程复用"""
+
+    __tablename__ = "courses_archive"
+    __table_args__ = (Index("ix_courses_archive_term", "academic_year", "semester"),)
+
+    id = Column(Integer, primary_key=True)
+    code = Column(String(20), index=True)
+    name = Column(String(100))
+    description = Column(String(500), nullable=True)
+    teacher = Column(String(100))
+    credits = Column(Integer)
+    max_student_num = Column(Integer)
+    enrolled_count = Column(Integer, nullable=False, default=0)
+    classroom_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    start_date = Column(DateTime(timezone=True), nullable=True)
+    end_date = Column(DateTime(timezone=True), nullable=True)
+    academic_year = Column(Integer, nullable=True, comment="学年")
+    semester = Column(Enum(Semester), nullable=True, comment="学期")
+    archived_at = Column(DateTime, server_default=func.now())
+
+
+class ArchivedCourseScheduleModel(Base):
+    __tablename__ = "course_schedules_archive"
+
+    id = Column(Integer, primary_key=True)
+    course_id = Column(Integer, index=True)
+    weekday = Column(Integer)
+    start_time = Column(Time)
+    end_time = Column(Time)
+
+
+class ArchivedStudentCourseModel(Base):
+    __tablename__ = "student_courses_archive"
+
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, index=True)
+    course_id = Column(Integer, index=True)
+    enrollment_date = Column(DateTime)
+
+
+class ArchivedTermModel(Base):
+    """已完成归档的学期，semester 为空表示整个学年"""
+
+    __tablename__ = "archived_terms"
+    __table_args__ = (
+        UniqueConstraint("academic_year", "semester", name="uq_archived_terms_term"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    academic_year = Column(Integer, nullable=False)
+    semester = Column(Enum(Semester), nullable=True)
+    courses = Column(Integer, default=0, comment="归档的课程数")
+    schedules = Column(Integer, default=0, comment="归档的时间安排数")
+    enrollments = Column(Integer, default=0, comment="归档的选课记录数")
+    archived_at = Column(DateTime, default=lambda: datetime.datetime.now(timezone.utc))
+
+
+class JobModel(Base):
+    """后台任务的状态和进度，由任务线程在短事务中更新"""
+
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_created_at", "status", "created_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String(50), nullable=False, comment="任务类型，如 delete_course")
+    status = Column(
+        String(20),
+        nullable=False,
+        default="pending",
+        comment="pending、running、succeeded 或 failed",
+    )
+    params = Column(Text, comment="任务参数，JSON")
+    progress = Column(Integer, nullable=False, default=0, comment="已处理的数量")
+    total = Column(Integer, nullable=True, comment="需处理的总数，未知时为空")
+    result = Column(Text, nullable=True, comment="任务结果，JSON")
+    error = Column(String(500), nullable=True)
+    created_by = Column(Integer, nullable=True, comment="提交任务的用户 ID")
+    owner = Column(
+        String(100), nullable=True, comment="执行任务的进程，主机名:进程号:标识"
+    )
+    heartbeat_at = Column(DateTime, nullable=True, comment="执行进程最近一次心跳的时间")
+    created_at = Column(DateTime, default=lambda: datetime.datetime.now(timezone.utc))
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
 class ClassroomModel(Base):
     __tablename__ = "classrooms"
 
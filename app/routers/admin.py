@@ -0,0 +1,109 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.schemas import Semester
+from app.utils.archive import check_archivable
+from app.utils.auth import get_current_admin
+from app.utils.catalog import Term
+from app.utils.db_pool import pool_status
+from app.utils.init_db import get_db, get_engine
+from app.utils.jobs import job_runner, job_to_dict
+from app.utils.profiler import profile_report
+from app.utils.replicas import get_replica_router
+from app.utils.response import response_error, response_success
+from app.utils.shards import get_enrollment_shards
+from app.utils.slow_query import slow_query_log
+from app.utils.tracing import trace_exporter
+
+router = APIRouter(dependencies=[Depends(get_current_admin)])
+
+
+@router.get("/admin/db-pool")
+def get_db_pool_status():
+    """获取数据库连接池状态（仅管理员）"""
+    return response_success(
+        data={
+            "primary": pool_status(get_engine()),
+            "replicas": get_replica_router().status(),
+            "enrollment_shards": get_enrollment_shards().status(),
+        }
+    )
+
+
+@router.post("/admin/enrolled-counts/reconcile")
+def reconcile_course_enrolled_counts(
+    repair: bool = Query(True, description="是否修复发现的偏差"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_admin),
+):
+    """提交核对课程已选人数与选课记录的后台任务（仅管理员）
+
+    有偏差的课程通过 GET /api/jobs/{job_id} 查询。
+    """
+    job = job_runner.submit(
+        db, "reconcile_enrolled_counts", {"repair": repair}, current_user.id
+    )
+    return response_success(message="核对任务已提交", data=job_to_dict(job))
+
+
+@router.get("/admin/sql-profile")
+def get_sql_profile(limit: int = Query(50, description="返回最近请求的数量")):
+    """获取按路由汇总的 SQL 执行统计及最近请求明细（仅管理员）"""
+    return response_success(data=profile_report.snapshot(limit))
+
+
+@router.get("/admin/slow-queries")
+def get_slow_queries(limit: int = Query(50, description="返回最近慢查询的数量")):
+    """获取最近的慢查询及其执行计划（仅管理员）"""
+    return response_success(data=slow_query_log.snapshot(limit))
+
+
+@router.delete("/admin/slow-queries")
+def clear_slow_queries():
+    """清空慢查询记录（仅管理员）"""
+    slow_query_log.clear()
+    return response_success(message="慢查询记录已清空")
+
+
+@router.get("/admin/traces")
+def get_traces(limit: int = Query(10, description="返回最慢的 trace 数量")):
+    """获取最近采样的请求中耗时最长的 trace（仅管理员）"""
+    return response_success(
+        data=[
+            {"trace_id": trace.trace_id, **trace.to_tree()}
+            for trace in trace_exporter.slowest(limit)
+        ]
+    )
+
+
+@router.get("/admin/traces/{trace_id}")
+def get_trace(trace_id: str):
+    """以 OTLP/JSON 格式获取单个 trace（仅管理员）"""
+    trace = trace_exporter.find(trace_id)
+    if trace is None:
+        return response_error(code=404, message="trace 不存在或已被淘汰")
+    return response_success(data=trace.to_otlp())
+
+
+@router.post("/admin/archive")
+def start_term_archive(
+    academic_year: int = Query(..., description="要归档的学年"),
+    semester: Optional[Semester] = Query(
+        None, description="学期，不指定时归档整个学年"
+    ),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_admin),
+):
+    """提交归档任务，分批把已结束学期的课程、时间安排和选课记录移入归档表（仅管理员）
+
+    进度通过 GET /api/jobs/{job_id} 查询。
+    """
+    term = Term.of(academic_year, semester)
+    try:
+        check_archivable(db, term)
+    except ValueError as e:
+        return response_error(message=str(e))
+    job = job_runner.submit(db, "archive_term", term._asdict(), current_user.id)
+    return response_success(message="归档任务已提交", data=job_to_dict(job))
@@ -18,7 +18,7 @@ router = APIRouter()
 
 
 @router.post("/login")
-async def login(login_data: LoginData, db: Session = Depends(get_db)):
+def login(login_data: LoginData, db: Session = Depends(get_db)):
     student = (
         db.query(StudentModel)
         .filter(StudentModel.username == login_data.username)
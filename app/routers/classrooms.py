@@ -1,3 +1,4 @@
+import itertools
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
@@ -5,6 +6,13 @@ from sqlalchemy.orm import Session
 
 from app.models import ClassroomModel
 from app.schemas import Classroom, ClassroomCreate, ClassroomUpdate
+from app.utils.catalog import (
+    CatalogSnapshot,
+    bump_catalog_version,
+    catalog_store,
+    get_catalog,
+    record_to_dict,
+)
 from app.utils.init_db import get_db
 from app.utils.response import model_to_dict, response_success
 
@@ -22,7 +30,9 @@ def create_classroom(classroom: ClassroomCreate, db: Session = Depends(get_db)):
 
     db_classroom = ClassroomModel(**classroom.model_dump())
     db.add(db_classroom)
+    bump_catalog_version(db)
     db.commit()
+    catalog_store.invalidate()
     db.refresh(db_classroom)
     return response_success(data=model_to_dict(db_classroom))
 
@@ -32,25 +42,26 @@ def get_classrooms(
     name: str | None = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    catalog: CatalogSnapshot = Depends(get_catalog),
 ):
-    query = db.query(ClassroomModel)
+    classrooms = catalog.classrooms.values()
 
     if name:
-        query = query.filter(ClassroomModel.name.ilike(f"%{name}%"))
+        keyword = name.lower()
+        classrooms = [c for c in classrooms if keyword in c.name.lower()]
 
-    classrooms = query.offset(skip).limit(limit).all()
-    return response_success(data=[model_to_dict(classroom) for classroom in classrooms])
+    classrooms = itertools.islice(classrooms, skip, skip + limit)
+    return response_success(
+        data=[record_to_dict(classroom) for classroom in classrooms]
+    )
 
 
 @router.get("/classrooms/{classroom_id}", response_model=Classroom)
-def get_classroom(classroom_id: int, db: Session = Depends(get_db)):
-    classroom = (
-        db.query(ClassroomModel).filter(ClassroomModel.id == classroom_id).first()
-    )
+def get_classroom(classroom_id: int, catalog: CatalogSnapshot = Depends(get_catalog)):
+    classroom = catalog.classrooms.get(classroom_id)
     if classroom is None:
         raise HTTPException(status_code=404, detail="教室不存在")
-    return response_success(data=model_to_dict(classroom))
+    return response_success(data=record_to_dict(classroom))
 
 
 @router.put("/classrooms/{classroom_id}", response_model=Classroom)
@@ -79,7 +90,9 @@ def update_classroom(
     for field, value in update_data.items():
         setattr(db_classroom, field, value)
 
+    bump_catalog_version(db)
     db.commit()
+    catalog_store.invalidate()
     db.refresh(db_classroom)
     return response_success(data=model_to_dict(db_classroom))
 
@@ -93,5 +106,7 @@ def delete_classroom(classroom_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="教室不存在")
 
     db.delete(db_classroom)
+    bump_catalog_version(db)
     db.commit()
+    catalog_store.invalidate()
     return response_success(data={"message": "教室已删除"})
@@ -1,23 +1,65 @@
+import asyncio
+import itertools
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Security
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from app.config import get_settings
 from app.models import (
+    ArchivedCourseModel,
     ClassroomModel,
     CourseModel,
-    CourseScheduleModel,
-    StudentCourseModel,
     StudentModel,
 )
 from app.schemas import CourseCreate, CourseUpdate, CourseWithSchedule
+from app.utils.archive import enrolled_course_ids, get_term_catalog, term_params
+from app.utils.audit import record_audit
 from app.utils.auth import get_current_user
+from app.utils.catalog import (
+    CatalogSnapshot,
+    CourseRecord,
+    Term,
+    bump_catalog_version,
+    catalog_store,
+    describe_teacher_conflicts,
+    lock_teacher_courses,
+    normalize_teacher,
+    record_to_dict,
+)
 from app.utils.init_db import get_db
-from app.utils.response import model_to_dict, response_error, response_success
+from app.utils.jobs import job_runner, job_to_dict
+from app.utils.metrics import ENROLLMENT_OUTCOMES
+from app.utils.replicas import get_read_db, mark_recent_write
+from app.utils.response import (
+    model_to_dict,
+    parse_fieldset,
+    response_error,
+    response_success,
+)
+from app.utils.seats import load_remaining_seats, seat_broadcaster, sse_event
+from app.utils.shards import get_enrollment_shards, route_enrollments
+from app.utils.statements import (
+    COURSE_SCHEDULES,
+    COURSE_SEATS,
+    ENROLLED_COURSE_IDS,
+    ENROLLED_SCHEDULES,
+    ENROLLMENT_EXISTS,
+    INSERT_ENROLLMENT,
+    RESERVE_SEAT,
+    SCHEDULES_OF_COURSES,
+)
+
+settings = get_settings()
 
 router = APIRouter()
 
+# 课程列表可选返回的关联数据
+COURSE_INCLUDES = ("schedules", "classroom")
+
 
 @router.post("/courses")
 def create_course(course: CourseCreate, db: Session = Depends(get_db)):
@@ -36,7 +78,9 @@ def create_course(course: CourseCreate, db: Session = Depends(get_db)):
 
         db_course = CourseModel(**course_data)
         db.add(db_course)
+        bump_catalog_version(db)
         db.commit()
+        catalog_store.invalidate()
         db.refresh(db_course)
 
         # 转换为字典并添加教室信息
@@ -56,25 +100,54 @@ def create_course(course: CourseCreate, db: Session = Depends(get_db)):
 @router.get("/courses", response_model=List[CourseWithSchedule])
 def get_courses(
     name: str | None = None,
+    teacher: str | None = None,
+    classroom_id: int | None = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    fields: str | None = Query(
+        None, description="逗号分隔的课程字段，默认返回全部字段"
+    ),
+    include: str | None = Query(
+        None, description="逗号分隔的关联数据：schedules、classroom，默认全部返回"
+    ),
+    term: Term = Depends(term_params),
+    catalog: CatalogSnapshot = Depends(get_term_catalog),
 ):
-    query = db.query(CourseModel)
-
+    # id 总是返回，便于客户端关联数据
+    course_fields = parse_fieldset(fields, CourseRecord._fields)
+    if course_fields is not None and "id" not in course_fields:
+        course_fields.insert(0, "id")
+    includes = parse_fieldset(include, COURSE_INCLUDES, "include")
+    if includes is None:
+        includes = COURSE_INCLUDES
+
+    # 优先使用目录快照中的索引缩小范围
+    if teacher is not None:
+        courses = catalog.courses_by_teacher(teacher)
+    elif classroom_id is not None:
+        courses = catalog.courses_in_classroom(classroom_id)
+    else:
+        courses = catalog.courses_in_term(term)
+
+    if term.academic_year is not None and (
+        teacher is not None or classroom_id is not None
+    ):
+        courses = [c for c in courses if term.includes(c)]
+    if classroom_id is not None:
+        courses = [c for c in courses if c.classroom_id == classroom_id]
     if name:
-        query = query.filter(CourseModel.name.ilike(f"%{name}%"))
-
-    courses = query.offset(skip).limit(limit).all()
+        keyword = name.lower()
+        courses = [c for c in courses if keyword in c.name.lower()]
 
     # 转换为字典并添加教室信息
     result = []
-    for course in courses:
-        course_dict = model_to_dict(course)
-        course_dict["schedules"] = [
-            model_to_dict(schedule) for schedule in course.schedules
-        ]
-        course_dict["classroom_name"] = course.classroom.name
+    for course in itertools.islice(courses, skip, skip + limit):
+        course_dict = catalog.course_dict(
+            course, course_fields, include_schedules="schedules" in includes
+        )
+        if "classroom" in includes:
+            classroom = catalog.classroom_of(course)
+            course_dict["classroom_name"] = classroom.name if classroom else None
         result.append(course_dict)
 
     return response_success(data=result)
@@ -88,64 +161,56 @@ def get_my_course_selection(
     start_date: Optional[str] = Query(None, description="开始日期 (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="结束日期 (YYYY-MM-DD)"),
     is_enrolled: Optional[int] = Query(None, description="选课状态：1-已选，0-未选"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: StudentModel = Security(get_current_user),
+    term: Term = Depends(term_params),
+    catalog: CatalogSnapshot = Depends(get_term_catalog),
 ):
     try:
         # 获取当前用户的所有选课记录
-        my_enrollments = (
-            db.query(StudentCourseModel)
-            .filter(StudentCourseModel.student_id == current_user.id)
-            .all()
-        )
-        enrolled_course_ids = {enrollment.course_id for enrollment in my_enrollments}
-
-        # 构建基础查询
-        query = db.query(CourseModel)
-
-        # 根据选课状态筛选
-        if is_enrolled is not None:
-            if is_enrolled == 1:
-                query = query.filter(CourseModel.id.in_(enrolled_course_ids))
-            elif is_enrolled == 0:
-                query = query.filter(CourseModel.id.notin_(enrolled_course_ids))
-
-        # 应用其他过滤条件
-        if name:
-            query = query.filter(CourseModel.name.like(f"%{name}%"))
-        if code:
-            query = query.filter(CourseModel.code.like(f"%{code}%"))
-        if teacher:
-            query = query.filter(CourseModel.teacher.like(f"%{teacher}%"))
+        enrolled_ids = set(enrolled_course_ids(db, current_user.id, catalog))
 
         try:
-            if start_date:
-                start = datetime.strptime(start_date, "%Y-%m-%d")
-                query = query.filter(CourseModel.start_date >= start)
-            if end_date:
-                end = datetime.strptime(end_date, "%Y-%m-%d")
-                query = query.filter(CourseModel.end_date <= end)
+            start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+            end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else None
         except ValueError:
             return response_error(message="日期格式错误，请使用 YYYY-MM-DD 格式")
 
-        # 执行查询
-        courses = query.all()
+        # 在目录快照中筛选课程
+        courses = []
+        for course in catalog.courses_in_term(term):
+            enrolled = course.id in enrolled_ids
+            if is_enrolled == 1 and not enrolled or is_enrolled == 0 and enrolled:
+                continue
+            if name and name.lower() not in course.name.lower():
+                continue
+            if code and code.lower() not in course.code.lower():
+                continue
+            if teacher and teacher.lower() not in course.teacher.lower():
+                continue
+            if start and (course.start_date is None or course.start_date < start):
+                continue
+            if end and (course.end_date is None or course.end_date > end):
+                continue
+            courses.append(course)
+
+        # 已选人数实时变化，不在快照中，单独读取
+        course_ids = [course.id for course in courses]
+        model = ArchivedCourseModel if catalog.archived else CourseModel
+        query = db.query(model.id, model.enrolled_count)
+        if len(course_ids) <= 1000:
+            query = query.filter(model.id.in_(course_ids))
+        enrolled_counts = dict(query.all())
 
         # 构建响应数据
         course_list = []
         for course in courses:
-            # 获取该课程的选课人数
-            enrolled_count = (
-                db.query(StudentCourseModel)
-                .filter(StudentCourseModel.course_id == course.id)
-                .count()
-            )
-
-            course_data = model_to_dict(course)
+            enrolled_count = enrolled_counts.get(course.id, 0)
+            course_data = record_to_dict(course)
             course_data.update(
                 {
-                    "is_enrolled": course.id in enrolled_course_ids,  # 是否已选
                     "enrolled_count": enrolled_count,  # 已选人数
+                    "is_enrolled": course.id in enrolled_ids,  # 是否已选
                     "remaining_slots": course.max_student_num
                     - enrolled_count,  # 剩余名额
                 }
@@ -157,20 +222,54 @@ def get_my_course_selection(
         return response_error(message=f"获取课程选择情况失败: {str(e)}")
 
 
+@router.get("/courses/seats/stream")
+async def stream_remaining_seats(request: Request):
+    """以 Server-Sent Events 推送课程剩余名额
+
+    连接后先推送一次全部课程的 snapshot 事件，之后每个周期推送有变化课程的
+    seats 事件（课程 ID -> 剩余名额，已删除的课程为 null），客户端据此更新
+    即可，无需轮询 /courses/my-selection。
+    """
+    # 先订阅再查询快照，避免错过两者之间的变化
+    subscriber = seat_broadcaster.subscribe()
+    try:
+        snapshot = await run_in_threadpool(load_remaining_seats)
+    except Exception:
+        seat_broadcaster.unsubscribe(subscriber)
+        raise
+
+    async def events():
+        try:
+            yield sse_event("snapshot", snapshot)
+            while not await request.is_disconnected():
+                try:
+                    await asyncio.wait_for(
+                        subscriber.ready.wait(), settings.SSE_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_event("seats", subscriber.take())
+        finally:
+            seat_broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/courses/{course_id}", response_model=CourseWithSchedule)
-def get_course(course_id: int, db: Session = Depends(get_db)):
-    course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
+def get_course(course_id: int, catalog: CatalogSnapshot = Depends(get_term_catalog)):
+    course = catalog.courses.get(course_id)
     if course is None:
         raise HTTPException(status_code=404, detail="课程不存在")
 
     # 转换为字典并添加教室信息
-    course_dict = model_to_dict(course)
-    course_dict["schedules"] = [
-        model_to_dict(schedule) for schedule in course.schedules
-    ]
-    course_dict["classroom"] = (
-        model_to_dict(course.classroom) if course.classroom else None
-    )
+    course_dict = catalog.course_dict(course)
+    classroom = catalog.classroom_of(course)
+    course_dict["classroom"] = record_to_dict(classroom) if classroom else None
 
     return response_success(data=course_dict)
 
@@ -178,66 +277,61 @@ def get_course(course_id: int, db: Session = Depends(get_db)):
 @router.post("/courses/{course_id}/enroll")
 def enroll_course(
     course_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: StudentModel = Security(get_current_user),
 ):
+    # 志愿抽签模式下不开放先到先得选课
+    if settings.SELECTION_MODE == "lottery":
+        ENROLLMENT_OUTCOMES.inc(outcome="closed")
+        return response_error(message="当前为志愿抽签选课模式，请提交课程志愿")
+
+    params = {"student_id": current_user.id, "course_id": course_id}
+    # 选课记录的读写走该学生所在的分片
+    route_enrollments(db, current_user.id)
+
     # 检查课程是否存在
-    course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
+    course = db.execute(COURSE_SEATS, params).first()
     if not course:
+        ENROLLMENT_OUTCOMES.inc(outcome="not_found")
         return response_error(code=404, message="课程不存在")
 
-    # 检查学生是否已经选择该课程
-    existing_enrollment = (
-        db.query(StudentCourseModel)
-        .filter(
-            StudentCourseModel.student_id == current_user.id,
-            StudentCourseModel.course_id == course_id,
-        )
-        .first()
-    )
+    # 正在删除的课程已关闭选课
+    if course.closed:
+        ENROLLMENT_OUTCOMES.inc(outcome="closed")
+        return response_error(message="课程已关闭选课")
 
-    if existing_enrollment:
+    # 检查学生是否已经选择该课程
+    if db.execute(ENROLLMENT_EXISTS, params).first():
+        ENROLLMENT_OUTCOMES.inc(outcome="duplicate")
         return response_error(message="已经选择了该课程")
 
-    # 检查课程是否已满
-    current_students = (
-        db.query(StudentCourseModel)
-        .filter(StudentCourseModel.course_id == course_id)
-        .count()
-    )
-
-    if current_students >= course.max_student_num:
+    # 检查课程是否已满，最终以写入时的条件更新为准
+    if course.enrolled_count >= course.max_student_num:
+        ENROLLMENT_OUTCOMES.inc(outcome="full")
         return response_error(message="课程已满")
 
     # 检查时间冲突
-    course_schedules = (
-        db.query(CourseScheduleModel)
-        .filter(CourseScheduleModel.course_id == course_id)
-        .all()
-    )
+    course_schedules = db.execute(COURSE_SCHEDULES, params).all()
 
     if course_schedules:
-        # 获取学生已选课程的时间安排
-        enrolled_courses = (
-            db.query(StudentCourseModel)
-            .filter(StudentCourseModel.student_id == current_user.id)
-            .all()
-        )
-        enrolled_course_ids = [ec.course_id for ec in enrolled_courses]
+        # 获取学生已选课程的时间安排，分片后选课记录与课程不在同一个库，分两次查询
+        if get_enrollment_shards().enabled:
+            enrolled_ids = db.scalars(ENROLLED_COURSE_IDS, params).all()
+            existing_schedules = (
+                db.execute(SCHEDULES_OF_COURSES, {"course_ids": enrolled_ids}).all()
+                if enrolled_ids
+                else []
+            )
+        else:
+            existing_schedules = db.execute(ENROLLED_SCHEDULES, params).all()
 
         weekday_names = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
         conflicts = []
 
-        existing_schedules = (
-            db.query(CourseScheduleModel, CourseModel)
-            .join(CourseModel)
-            .filter(CourseScheduleModel.course_id.in_(enrolled_course_ids))
-            .all()
-        )
-
         # 检查每个时间段是否有冲突
         for new_schedule in course_schedules:
-            for existing_schedule, existing_course in existing_schedules:
+            for existing_schedule in existing_schedules:
                 if (
                     new_schedule.weekday == existing_schedule.weekday
                     and new_schedule.start_time < existing_schedule.end_time
@@ -246,25 +340,36 @@ def enroll_course(
                     conflicts.append(
                         f"{weekday_names[new_schedule.weekday]} "
                         f"{new_schedule.start_time.strftime('%H:%M')}-{new_schedule.end_time.strftime('%H:%M')} "
-                        f"与课程《{existing_course.name}》"
+                        f"与课程《{existing_schedule.name}》"
                         f"({existing_schedule.start_time.strftime('%H:%M')}-{existing_schedule.end_time.strftime('%H:%M')}) "
                         f"时间冲突"
                     )
 
         if conflicts:
             conflicts_str = "\n".join(conflicts)
+            ENROLLMENT_OUTCOMES.inc(outcome="conflict")
             return response_error(message=conflicts_str)
 
     try:
+        # 已选人数未达上限时才加一，与选课记录在同一事务中提交，并发选课不会超额
+        updated = db.execute(RESERVE_SEAT, params).rowcount
+        if not updated:
+            db.rollback()
+            ENROLLMENT_OUTCOMES.inc(outcome="full")
+            return response_error(message="课程已满")
+
         # 创建选课记录
-        new_enrollment = StudentCourseModel(
-            student_id=current_user.id, course_id=course_id
-        )
-        db.add(new_enrollment)
+        db.execute(INSERT_ENROLLMENT, params)
         db.commit()
+        # 选课后短时间内该学生的读请求走主库，保证能读到自己的选课结果
+        mark_recent_write(request)
+        ENROLLMENT_OUTCOMES.inc(outcome="success")
+        seat_broadcaster.mark_changed(course_id)
+        record_audit("enroll", current_user.id, course_id)
         return response_success(message="选课成功")
     except Exception as e:
         db.rollback()
+        ENROLLMENT_OUTCOMES.inc(outcome="error")
         return response_error(message=f"选课失败: {str(e)}")
 
 
@@ -290,11 +395,27 @@ def update_course(
                 if not classroom:
                     return response_error(message="指定的教室不存在")
 
+        # 更换教师时检查新教师在该课程的上课时间是否已有其他课程
+        new_teacher = update_data.get("teacher")
+        if new_teacher and normalize_teacher(new_teacher) != normalize_teacher(
+            db_course.teacher
+        ):
+            catalog = lock_teacher_courses(db, new_teacher, course_id)
+            conflicts = describe_teacher_conflicts(
+                catalog, new_teacher, catalog.schedules(course_id), course_id
+            )
+            if conflicts:
+                db.rollback()
+                return response_error(message="\n".join(conflicts))
+
         for key, value in update_data.items():
             setattr(db_course, key, value)
 
+        bump_catalog_version(db)
         db.commit()
+        catalog_store.invalidate()
         db.refresh(db_course)
+        seat_broadcaster.mark_changed(course_id)
 
         # 转换为字典并添加教室信息
         course_dict = model_to_dict(db_course)
@@ -313,28 +434,22 @@ def update_course(
 
 
 @router.delete("/courses/{course_id}")
-def delete_course(course_id: int, db: Session = Depends(get_db)):
-    try:
-        # 检查课程是否存在
-        course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
-        if not course:
-            return response_error(code=404, message="课程不存在")
-
-        # 删除相关的选课记录
-        db.query(StudentCourseModel).filter(
-            StudentCourseModel.course_id == course_id
-        ).delete()
-
-        # 删除课程时间安排
-        db.query(CourseScheduleModel).filter(
-            CourseScheduleModel.course_id == course_id
-        ).delete()
-
-        # 删除课程
-        db.query(CourseModel).filter(CourseModel.id == course_id).delete()
+def delete_course(
+    course_id: int,
+    db: Session = Depends(get_db),
+    current_user: StudentModel = Security(get_current_user),
+):
+    """提交删除课程的后台任务，选课记录较多时分批删除，不占用请求"""
+    # 检查课程是否存在
+    course = db.query(CourseModel.id).filter(CourseModel.id == course_id).first()
+    if not course:
+        return response_error(code=404, message="课程不存在")
 
-        db.commit()
-        return response_success(message="课程删除成功")
+    try:
+        job = job_runner.submit(
+            db, "delete_course", {"course_id": course_id}, current_user.id
+        )
     except Exception as e:
         db.rollback()
         return response_error(message=f"删除课程失败: {str(e)}")
+    return response_success(message="课程删除任务已提交", data=job_to_dict(job))
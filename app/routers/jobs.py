@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.models import JobModel
+from app.schemas import JobCreate
+from app.utils.auth import get_current_admin
+from app.utils.init_db import get_db
+from app.utils.jobs import API_JOB_TYPES, job_runner, job_to_dict
+from app.utils.response import response_error, response_success
+
+router = APIRouter(dependencies=[Depends(get_current_admin)])
+
+
+@router.post("/jobs")
+def create_job(
+    job: JobCreate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_admin),
+):
+    """提交后台任务，立即返回任务信息（仅管理员）"""
+    if job.type not in API_JOB_TYPES:
+        return response_error(message=f"不能通过该接口提交此类任务: {job.type}")
+    try:
+        db_job = job_runner.submit(db, job.type, job.params, current_user.id)
+    except ValueError as e:
+        return response_error(message=str(e))
+    return response_success(message="任务已提交", data=job_to_dict(db_job))
+
+
+@router.get("/jobs")
+def list_jobs(
+    type: str | None = Query(None, description="任务类型"),
+    status: str | None = Query(
+        None, description="任务状态：pending、running、succeeded、failed"
+    ),
+    limit: int = Query(20, description="返回最近任务的数量"),
+    db: Session = Depends(get_db),
+):
+    """获取最近的后台任务（仅管理员）"""
+    query = db.query(JobModel)
+    if type:
+        query = query.filter(JobModel.type == type)
+    if status:
+        query = query.filter(JobModel.status == status)
+    jobs = query.order_by(JobModel.id.desc()).limit(limit).all()
+    return response_success(data=[job_to_dict(job) for job in jobs])
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """获取后台任务的状态和进度（仅管理员）"""
+    job = db.get(JobModel, job_id)
+    if job is None:
+        return response_error(code=404, message="任务不存在")
+    return response_success(data=job_to_dict(job))
@@ -0,0 +1,123 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Security
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import CourseModel, CoursePreferenceModel, StudentModel
+from app.schemas import AllocationRun, CoursePreferenceSubmit
+from app.utils.auth import get_current_admin, get_current_user
+from app.utils.init_db import get_db
+from app.utils.jobs import job_runner, job_to_dict
+from app.utils.replicas import get_read_db
+from app.utils.response import response_error, response_success
+
+settings = get_settings()
+
+router = APIRouter()
+
+
+def in_preference_window() -> bool:
+    """判断当前时间是否处于志愿填报时间窗口内"""
+    start = settings.PREFERENCE_WINDOW_START
+    end = settings.PREFERENCE_WINDOW_END
+    if start is not None and datetime.now(start.tzinfo) < start:
+        return False
+    if end is not None and datetime.now(end.tzinfo) > end:
+        return False
+    return True
+
+
+@router.post("/preferences")
+def submit_preferences(
+    preference: CoursePreferenceSubmit,
+    db: Session = Depends(get_db),
+    current_user: StudentModel = Security(get_current_user),
+):
+    """提交课程志愿（覆盖之前提交的志愿）"""
+    if settings.SELECTION_MODE != "lottery":
+        return response_error(message="当前不是志愿抽签选课模式")
+
+    if not in_preference_window():
+        return response_error(message="当前不在志愿填报时间内")
+
+    course_ids = preference.course_ids
+    if len(course_ids) > settings.MAX_PREFERENCES:
+        return response_error(message=f"最多只能填报 {settings.MAX_PREFERENCES} 个志愿")
+
+    if len(set(course_ids)) != len(course_ids):
+        return response_error(message="志愿课程不能重复")
+
+    existing_count = (
+        db.query(CourseModel.id).filter(CourseModel.id.in_(course_ids)).count()
+    )
+    if existing_count != len(course_ids):
+        return response_error(message="志愿中包含不存在的课程")
+
+    try:
+        db.query(CoursePreferenceModel).filter(
+            CoursePreferenceModel.student_id == current_user.id
+        ).delete()
+        db.add_all(
+            [
+                CoursePreferenceModel(
+                    student_id=current_user.id, course_id=course_id, rank=rank
+                )
+                for rank, course_id in enumerate(course_ids, start=1)
+            ]
+        )
+        db.commit()
+        return response_success(message="志愿提交成功", data={"course_ids": course_ids})
+    except Exception as e:
+        db.rollback()
+        return response_error(message=f"志愿提交失败: {str(e)}")
+
+
+@router.get("/preferences/my")
+def get_my_preferences(
+    db: Session = Depends(get_read_db),
+    current_user: StudentModel = Security(get_current_user),
+):
+    """获取当前用户提交的课程志愿"""
+    preferences = (
+        db.query(CoursePreferenceModel, CourseModel)
+        .join(CourseModel, CoursePreferenceModel.course_id == CourseModel.id)
+        .filter(CoursePreferenceModel.student_id == current_user.id)
+        .order_by(CoursePreferenceModel.rank)
+        .all()
+    )
+
+    return response_success(
+        data=[
+            {
+                "rank": preference.rank,
+                "course_id": course.id,
+                "course_code": course.code,
+                "course_name": course.name,
+            }
+            for preference, course in preferences
+        ]
+    )
+
+
+@router.post("/preferences/allocate")
+def allocate_preferences(
+    allocation: AllocationRun,
+    db: Session = Depends(get_db),
+    current_user: StudentModel = Security(get_current_admin),
+):
+    """提交按志愿批量抽签分配课程名额的后台任务（仅管理员）
+
+    分配结果通过 GET /api/jobs/{job_id} 查询。
+    """
+    if settings.SELECTION_MODE != "lottery":
+        return response_error(message="当前不是志愿抽签选课模式")
+
+    end = settings.PREFERENCE_WINDOW_END
+    if end is not None and datetime.now(end.tzinfo) <= end:
+        return response_error(message="志愿填报尚未结束，暂不能分配")
+
+    job = job_runner.submit(
+        db, "lottery_allocation", {"seed": allocation.seed}, current_user.id
+    )
+    return response_success(message="志愿分配任务已提交", data=job_to_dict(job))
@@ -1,24 +1,54 @@
-from fastapi import APIRouter, Depends, Security
+import json
+from collections import defaultdict
+from typing import List
+
+from fastapi import APIRouter, Depends, Query, Security
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.config import get_settings
 from app.models import (
-    ClassroomModel,
+    ArchivedStudentCourseModel,
     CourseModel,
     CourseScheduleModel,
     StudentCourseModel,
     StudentModel,
 )
-from app.schemas import CourseScheduleCreate
-from app.utils.auth import get_current_user
+from app.schemas import CourseScheduleCreate, StudentSchedulesQuery
+from app.utils.archive import enrolled_course_ids, get_term_catalog, term_params
+from app.utils.auth import get_current_admin, get_current_user
+from app.utils.catalog import (
+    CatalogSnapshot,
+    Term,
+    bump_catalog_version,
+    catalog_store,
+    describe_teacher_conflicts,
+    lock_teacher_courses,
+)
 from app.utils.init_db import get_db
+from app.utils.replicas import get_read_db
 from app.utils.response import response_error, response_success
+from app.utils.shards import (
+    enrollments_for_students,
+    get_enrollment_shards,
+    route_enrollments,
+)
+from app.utils.statements import SCHEDULE_CONFLICTS
+from app.utils.tracing import span
 
+settings = get_settings()
 router = APIRouter()
 
+# 超过该学生数时分块流式输出课程表
+STREAM_THRESHOLD = 100
+STREAM_CHUNK_SIZE = 50
+
 
 def check_time_conflict(db: Session, schedule: CourseScheduleCreate, student_id: int):
     """检查学生的课程时间冲突，返回冲突信息"""
     # 获取学生已选课程的ID列表
+    route_enrollments(db, student_id)
     enrolled_courses = (
         db.query(StudentCourseModel)
         .filter(StudentCourseModel.student_id == student_id)
@@ -31,24 +61,22 @@ def check_time_conflict(db: Session, schedule: CourseScheduleCreate, student_id:
 
     for slot in schedule.time_slots:
         # 检查学生在同一时间段是否有其他课程
-        conflicting_schedules = (
-            db.query(CourseScheduleModel, CourseModel)
-            .join(CourseModel)
-            .filter(
-                CourseScheduleModel.course_id.in_(enrolled_course_ids),
-                CourseScheduleModel.weekday == slot.weekday,
-                CourseScheduleModel.start_time < slot.end_time,
-                CourseScheduleModel.end_time > slot.start_time,
-            )
-            .all()
-        )
+        conflicting_schedules = db.execute(
+            SCHEDULE_CONFLICTS,
+            {
+                "course_ids": enrolled_course_ids,
+                "weekday": slot.weekday,
+                "start_time": slot.start_time,
+                "end_time": slot.end_time,
+            },
+        ).all()
 
-        for conflict_schedule, conflict_course in conflicting_schedules:
+        for conflict in conflicting_schedules:
             conflicts.append(
                 {
                     "weekday": weekday_names[slot.weekday],
-                    "conflict_course_name": conflict_course.name,
-                    "conflict_time": f"{conflict_schedule.start_time.strftime('%H:%M')}-{conflict_schedule.end_time.strftime('%H:%M')}",
+                    "conflict_course_name": conflict.name,
+                    "conflict_time": f"{conflict.start_time.strftime('%H:%M')}-{conflict.end_time.strftime('%H:%M')}",
                     "new_time": f"{slot.start_time.strftime('%H:%M')}-{slot.end_time.strftime('%H:%M')}",
                 }
             )
@@ -56,8 +84,42 @@ def check_time_conflict(db: Session, schedule: CourseScheduleCreate, student_id:
     return conflicts
 
 
+def build_schedule_data(
+    catalog: CatalogSnapshot, course_ids: List[int], term: Term
+) -> list:
+    """根据目录快照生成课程表，快照中还没有的课程和其他学期的课程会被跳过"""
+    schedule_data = []
+    for course_id in course_ids:
+        course = catalog.courses.get(course_id)
+        if course is None or not term.includes(course):
+            continue
+        classroom = catalog.classroom_of(course)
+        for schedule in catalog.schedules(course_id):
+            schedule_data.append(
+                {
+                    "course_id": course.id,
+                    "course_name": course.name,
+                    "start_date": (
+                        course.start_date.strftime("%Y-%m-%d")
+                        if course.start_date
+                        else None
+                    ),
+                    "end_date": (
+                        course.end_date.strftime("%Y-%m-%d")
+                        if course.end_date
+                        else None
+                    ),
+                    "weekday": schedule.weekday,
+                    "start_time": schedule.start_time.strftime("%H:%M"),
+                    "end_time": schedule.end_time.strftime("%H:%M"),
+                    "classroom_name": classroom.name if classroom else None,
+                }
+            )
+    return schedule_data
+
+
 @router.post("/schedules")
-async def create_course_schedule(
+def create_course_schedule(
     schedule: CourseScheduleCreate, db: Session = Depends(get_db)
 ):
     # 验证课程是否存在
@@ -85,6 +147,17 @@ async def create_course_schedule(
         if slot.weekday < 0 or slot.weekday > 6:
             return response_error(message="无效的星期数")
 
+    # 锁定该教师的课程后再检查教师在这些时间段是否已有其他课程
+    conflicts = describe_teacher_conflicts(
+        lock_teacher_courses(db, course.teacher, schedule.course_id),
+        course.teacher,
+        schedule.time_slots,
+        schedule.course_id,
+    )
+    if conflicts:
+        db.rollback()
+        return response_error(message="\n".join(conflicts))
+
     try:
         # 保存时间安排
         for slot in schedule.time_slots:
@@ -96,7 +169,9 @@ async def create_course_schedule(
             )
             db.add(schedule_model)
 
+        bump_catalog_version(db)
         db.commit()
+        catalog_store.invalidate()
 
         response_data = {
             "time_slots": [
@@ -116,87 +191,169 @@ async def create_course_schedule(
 
 
 @router.get("/schedules/my")
-async def get_my_schedules(
-    db: Session = Depends(get_db), current_user=Security(get_current_user)
+def get_my_schedules(
+    db: Session = Depends(get_read_db),
+    current_user=Security(get_current_user),
+    term: Term = Depends(term_params),
+    catalog: CatalogSnapshot = Depends(get_term_catalog),
 ):
-    # 获取学生选修的所有课程
-    enrolled_courses = (
-        db.query(StudentCourseModel, CourseModel)
-        .join(CourseModel)
-        .filter(StudentCourseModel.student_id == current_user.id)
-        .all()
-    )
+    # 只从数据库读取选课记录，课程、时间和教室信息来自目录快照
+    course_ids = enrolled_course_ids(db, current_user.id, catalog)
 
-    course_ids = [course.id for enrollment, course in enrolled_courses]
+    with span("schedules.build", courses=len(course_ids)):
+        schedule_data = build_schedule_data(catalog, course_ids, term)
 
-    # 修改查询，正确连接课程和教室
-    schedules = (
-        db.query(CourseScheduleModel, CourseModel, ClassroomModel)
-        .join(CourseModel, CourseScheduleModel.course_id == CourseModel.id)
-        .outerjoin(ClassroomModel, CourseModel.classroom_id == ClassroomModel.id)
-        .filter(CourseScheduleModel.course_id.in_(course_ids))
-        .all()
-    )
+    return response_success(data=schedule_data)
 
-    schedule_data = [
-        {
-            "course_id": course.id,
-            "course_name": course.name,
-            "start_date": course.start_date.strftime("%Y-%m-%d"),
-            "end_date": course.end_date.strftime("%Y-%m-%d"),
-            "weekday": schedule.weekday,
-            "start_time": schedule.start_time.strftime("%H:%M"),
-            "end_time": schedule.end_time.strftime("%H:%M"),
-            "classroom_name": classroom.name if classroom else None,
-        }
-        for schedule, course, classroom in schedules
-    ]
 
+@router.get("/schedules/teacher")
+def get_teacher_schedules(
+    teacher: str = Query(..., description="教师姓名，忽略大小写和多余空白"),
+    current_user=Security(get_current_user),
+    term: Term = Depends(term_params),
+    catalog: CatalogSnapshot = Depends(get_term_catalog),
+):
+    schedule_data = []
+    for schedule in catalog.teacher_schedules(teacher):
+        course = catalog.courses[schedule.course_id]
+        if not term.includes(course):
+            continue
+        classroom = catalog.classroom_of(course)
+        schedule_data.append(
+            {
+                "course_id": course.id,
+                "course_name": course.name,
+                "teacher": course.teacher,
+                "start_date": (
+                    course.start_date.strftime("%Y-%m-%d")
+                    if course.start_date
+                    else None
+                ),
+                "end_date": (
+                    course.end_date.strftime("%Y-%m-%d") if course.end_date else None
+                ),
+                "weekday": schedule.weekday,
+                "start_time": schedule.start_time.strftime("%H:%M"),
+                "end_time": schedule.end_time.strftime("%H:%M"),
+                "classroom_name": classroom.name if classroom else None,
+            }
+        )
     return response_success(data=schedule_data)
 
 
 @router.get("/schedules/student/{student_id}")
-async def get_student_schedules(
+def get_student_schedules(
     student_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user=Security(get_current_user),
+    term: Term = Depends(term_params),
+    catalog: CatalogSnapshot = Depends(get_term_catalog),
 ):
     # 检查学生是否存在
     student = db.query(StudentModel).filter(StudentModel.id == student_id).first()
     if not student:
         return response_error(code=404, message="学生不存在")
 
-    # 获取学生选修的所有课程
-    enrolled_courses = (
-        db.query(StudentCourseModel, CourseModel)
-        .join(CourseModel)
-        .filter(StudentCourseModel.student_id == student_id)
-        .all()
-    )
+    course_ids = enrolled_course_ids(db, student_id, catalog)
 
-    course_ids = [course.id for enrollment, course in enrolled_courses]
+    with span("schedules.build", courses=len(course_ids)):
+        schedule_data = build_schedule_data(catalog, course_ids, term)
 
-    # 查询课程表信息
-    schedules = (
-        db.query(CourseScheduleModel, CourseModel, ClassroomModel)
-        .join(CourseModel, CourseScheduleModel.course_id == CourseModel.id)
-        .outerjoin(ClassroomModel, CourseModel.classroom_id == ClassroomModel.id)
-        .filter(CourseScheduleModel.course_id.in_(course_ids))
-        .all()
-    )
+    return response_success(data=schedule_data)
 
-    schedule_data = [
-        {
-            "course_id": course.id,
-            "course_name": course.name,
-            "start_date": course.start_date.strftime("%Y-%m-%d"),
-            "end_date": course.end_date.strftime("%Y-%m-%d"),
-            "weekday": schedule.weekday,
-            "start_time": schedule.start_time.strftime("%H:%M"),
-            "end_time": schedule.end_time.strftime("%H:%M"),
-            "classroom_name": classroom.name if classroom else None,
-        }
-        for schedule, course, classroom in schedules
-    ]
 
-    return response_success(data=schedule_data)
+def student_schedule_item(
+    catalog: CatalogSnapshot, student, course_ids: list, term: Term
+) -> dict:
+    return {
+        "student_id": student.id,
+        "student_number": student.student_number,
+        "username": student.username,
+        "class_name": student.class_name,
+        "schedules": build_schedule_data(catalog, course_ids, term),
+    }
+
+
+def stream_student_schedules(
+    catalog: CatalogSnapshot, students: list, course_ids_by_student: dict, term: Term
+):
+    """按块生成与 response_success 结构相同的 JSON，不在内存中拼出完整响应"""
+    yield '{"code": 200, "message": "Success", "data": ['
+    for start in range(0, len(students), STREAM_CHUNK_SIZE):
+        body = ", ".join(
+            json.dumps(
+                student_schedule_item(
+                    catalog, student, course_ids_by_student[student.id], term
+                ),
+                ensure_ascii=False,
+            )
+            for student in students[start : start + STREAM_CHUNK_SIZE]
+        )
+        yield ", " + body if start else body
+    yield "]}"
+
+
+@router.post("/schedules/students")
+def get_students_schedules(
+    query: StudentSchedulesQuery,
+    db: Session = Depends(get_read_db),
+    # 批量导出他人课程表，仅管理员可用
+    current_user=Security(get_current_admin),
+    term: Term = Depends(term_params),
+    catalog: CatalogSnapshot = Depends(get_term_catalog),
+):
+    if (query.student_ids is None) == (query.class_name is None):
+        return response_error(message="请提供 student_ids 或 class_name 其中之一")
+    if query.student_ids is not None:
+        if len(query.student_ids) > settings.MAX_BATCH_STUDENT_IDS:
+            return response_error(
+                message=f"一次最多查询 {settings.MAX_BATCH_STUDENT_IDS} 名学生"
+            )
+        condition = StudentModel.id.in_(query.student_ids)
+    else:
+        condition = StudentModel.class_name == query.class_name
+
+    # 学生和选课记录各一次查询，课程、时间和教室信息来自目录快照
+    enrollment = ArchivedStudentCourseModel if catalog.archived else StudentCourseModel
+    students = db.execute(
+        select(
+            StudentModel.id,
+            StudentModel.student_number,
+            StudentModel.username,
+            StudentModel.class_name,
+        )
+        .where(condition)
+        .order_by(StudentModel.id)
+    ).all()
+    if not catalog.archived and get_enrollment_shards().enabled:
+        # 选课记录分片后按学生所在分片并行查询
+        enrollments = enrollments_for_students(db, [s.id for s in students])
+    else:
+        enrollments = db.execute(
+            select(enrollment.student_id, enrollment.course_id)
+            .where(
+                enrollment.student_id.in_(
+                    select(StudentModel.id).where(condition).scalar_subquery()
+                )
+            )
+            .order_by(enrollment.student_id, enrollment.id)
+        ).all()
+
+    course_ids_by_student = defaultdict(list)
+    for student_id, course_id in enrollments:
+        course_ids_by_student[student_id].append(course_id)
+
+    if len(students) > STREAM_THRESHOLD:
+        return StreamingResponse(
+            stream_student_schedules(catalog, students, course_ids_by_student, term),
+            media_type="application/json",
+        )
+
+    with span("schedules.build", students=len(students)):
+        items = [
+            student_schedule_item(
+                catalog, student, course_ids_by_student[student.id], term
+            )
+            for student in students
+        ]
+    return response_success(data=items)
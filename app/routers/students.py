@@ -2,20 +2,29 @@ from datetime import datetime, timezone
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
-
-from app.models import StudentModel
+from sqlalchemy import and_, update
+from sqlalchemy.orm import Session, load_only
+
+from app.models import (
+    CourseModel,
+    CoursePreferenceModel,
+    StudentCourseModel,
+    StudentModel,
+)
 from app.schemas import StudentCreate, StudentUpdate
+from app.utils.audit import record_audit
 from app.utils.auth import get_current_user
 from app.utils.init_db import get_db
-from app.utils.response import model_to_dict, response_success
+from app.utils.replicas import get_read_db
+from app.utils.response import model_to_dict, parse_fieldset, response_success
+from app.utils.seats import seat_broadcaster
+from app.utils.shards import route_enrollments
 
 router = APIRouter()
 
 
 @router.post("/students")
-async def create_student(
+def create_student(
     student: StudentCreate,
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -61,19 +70,33 @@ async def create_student(
 
 
 @router.get("/students")
-async def list_students(
+def list_students(
     username: str = Query(default=None, description="用户名模糊搜索"),
     student_number: str = Query(default=None, description="学号精确搜索"),
     email: str = Query(default=None, description="邮箱模糊搜索"),
+    fields: str = Query(
+        default=None, description="逗号分隔的返回字段，默认返回全部字段"
+    ),
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     # 检查权限
     if current_user.username != "admin":
         raise HTTPException(status_code=403, detail="没有权限执行此操作")
 
+    student_fields = parse_fieldset(
+        fields, [column.name for column in StudentModel.__table__.columns]
+    )
+    if student_fields is not None and "id" not in student_fields:
+        student_fields.insert(0, "id")
+
     # 构建查询
     query = db.query(StudentModel).filter(StudentModel.username != "admin")
+    if student_fields is not None:
+        # 只查询需要的列，主键总会被加载
+        query = query.options(
+            load_only(*[getattr(StudentModel, field) for field in student_fields])
+        )
 
     # 如果提供了username参数，添加模糊查询条件
     if username:
@@ -88,14 +111,16 @@ async def list_students(
         query = query.filter(StudentModel.email.like(f"%{email}%"))
 
     students = query.all()
-    return response_success(data=[model_to_dict(student) for student in students])
+    return response_success(
+        data=[model_to_dict(student, student_fields) for student in students]
+    )
 
 
 @router.get("/students/{student_id}")
-async def get_student(
+def get_student(
     student_id: int,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     # 检查权限
     if current_user.username != "admin" and current_user.id != student_id:
@@ -109,7 +134,7 @@ async def get_student(
 
 
 @router.put("/students/{student_id}")
-async def update_student(
+def update_student(
     student_id: int,
     student_update: StudentUpdate,
     current_user=Depends(get_current_user),
@@ -151,7 +176,7 @@ async def update_student(
 
 
 @router.delete("/students/{student_id}")
-async def delete_student(
+def delete_student(
     student_id: int,
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -164,8 +189,34 @@ async def delete_student(
     if not student:
         raise HTTPException(status_code=404, detail="学生不存在")
 
+    # 先删除学生的选课记录并同步课程已选人数，避免留下孤立的选课记录
+    route_enrollments(db, student_id)
+    enrolled_course_ids = [
+        course_id
+        for (course_id,) in db.query(StudentCourseModel.course_id).filter(
+            StudentCourseModel.student_id == student_id
+        )
+    ]
+    if enrolled_course_ids:
+        db.execute(
+            update(CourseModel)
+            .where(CourseModel.id.in_(enrolled_course_ids))
+            .values(enrolled_count=CourseModel.enrolled_count - 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.query(StudentCourseModel).filter(
+            StudentCourseModel.student_id == student_id
+        ).delete(synchronize_session=False)
+    db.query(CoursePreferenceModel).filter(
+        CoursePreferenceModel.student_id == student_id
+    ).delete(synchronize_session=False)
+
     # 物理删除学生记录
     db.delete(student)
     db.commit()
+    for course_id in enrolled_course_ids:
+        record_audit("drop", student_id, course_id, detail="学生被删除")
+        seat_broadcaster.mark_changed(course_id)
+    record_audit("delete_student", student_id, detail=student.username)
 
     return response_success()
@@ -2,7 +2,7 @@ from datetime import date, datetime, time
 from enum import Enum
 from typing import List, Optional
 
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import BaseModel, ConfigDict, EmailStr, field_validator
 
 
 class Gender(int, Enum):
@@ -190,6 +190,50 @@ class CourseScheduleCreate(BaseModel):
     time_slots: List[TimeSlot]
 
 
+class StudentSchedulesQuery(BaseModel):
+    student_ids: Optional[List[int]] = None
+    class_name: Optional[str] = None  # 与 student_ids 二选一，按班级查询
+
+
+class CoursePreferenceSubmit(BaseModel):
+    course_ids: List[int]  # 按志愿顺序排列，第一个为第一志愿
+
+
+class AllocationRun(BaseModel):
+    seed: Optional[int] = None  # 随机种子，便于复现抽签结果
+
+
+class JobCreate(BaseModel):
+    type: str  # 任务类型，见 app.utils.jobs 中注册的任务
+    params: dict = {}
+
+
+# 各类后台任务的参数，提交时校验，不允许多余的字段
+class DeleteCourseJobParams(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    course_id: int
+
+
+class ArchiveTermJobParams(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    academic_year: int
+    semester: Optional[Semester] = None  # 不指定时归档整个学年
+
+
+class ReconcileJobParams(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    repair: bool = True
+
+
+class LotteryAllocationJobParams(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    seed: Optional[int] = None
+
+
 class ClassroomBase(BaseModel):
     name: str
     capacity: int
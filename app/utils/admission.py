@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import re
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from anyio import to_thread
+
+from app.config import get_settings
+from app.utils.metrics import Counter, Gauge, registry
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ADMISSION_ACTIVE = registry.register(
+    Gauge("admission_active_requests", "各类路由正在执行的请求数", ("route_class",))
+)
+ADMISSION_WAITING = registry.register(
+    Gauge("admission_waiting_requests", "各类路由正在排队的请求数", ("route_class",))
+)
+ADMISSION_REJECTED = registry.register(
+    Counter(
+        "admission_rejected_requests",
+        "因过载被拒绝的请求，reason 为 queue_full 或 timeout",
+        ("route_class", "reason"),
+    )
+)
+
+# 按顺序匹配，第一个命中的规则决定路由类别；未命中的请求不受限制
+ROUTE_CLASS_RULES = [
+    ("enrollment", {"POST"}, re.compile(r"^/api/courses/\d+/enroll$")),
+    ("admin", None, re.compile(r"^/api/admin/")),
+    ("admin", None, re.compile(r"^/api/jobs(/|$)")),
+    ("admin", {"POST"}, re.compile(r"^/api/preferences/allocate$")),
+    ("enrollment", None, re.compile(r"^/api/preferences(/|$)")),
+    ("catalog", {"GET"}, re.compile(r"^/api/(courses|classrooms|schedules)(/|$)")),
+    ("catalog", {"POST"}, re.compile(r"^/api/schedules/students$")),
+    (
+        "admin",
+        {"POST", "PUT", "DELETE"},
+        re.compile(r"^/api/(courses|classrooms|schedules|students)(/|$)"),
+    ),
+]
+# 长连接不占用并发名额
+EXCLUDED_PATHS = {"/api/courses/seats/stream"}
+
+
+def classify_route(method: str, path: str) -> Optional[str]:
+    if path in EXCLUDED_PATHS:
+        return None
+    for route_class, methods, pattern in ROUTE_CLASS_RULES:
+        if (methods is None or method in methods) and pattern.match(path):
+            return route_class
+    return None
+
+
+def threadpool_size() -> int:
+    """同步路由线程池大小，默认等于连接池的最大连接数"""
+    return settings.THREADPOOL_SIZE or settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+
+
+def configure_threadpool() -> int:
+    """调整 Starlette 同步路由使用的线程池大小，需在事件循环中调用"""
+    size = threadpool_size()
+    to_thread.current_default_thread_limiter().total_tokens = size
+    return size
+
+
+def route_class_limits() -> Dict[str, Tuple[int, int]]:
+    """各类路由的 (并发上限, 排队长度)，可用 ADMISSION_LIMITS 覆盖"""
+    threads = threadpool_size()
+    limits = {
+        # 选课请求在整个事务期间占用连接，并发不超过连接池常驻连接数
+        "enrollment": (settings.DB_POOL_SIZE, settings.DB_POOL_SIZE * 10),
+        # 目录读取大多由内存快照提供，只受线程池限制
+        "catalog": (threads, threads * 10),
+        "admin": (2, 10),
+    }
+    for route_class, item in settings.ADMISSION_LIMITS.items():
+        concurrency, queue_size = limits.get(route_class, (1, 0))
+        limits[route_class] = (
+            item.get("concurrency", concurrency),
+            item.get("queue", queue_size),
+        )
+    return limits
+
+
+class RouteClassLimiter:
+    """一类路由的并发上限和有界 FIFO 等待队列，只在事件循环线程中使用"""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self, timeout: float) -> Optional[str]:
+        """获得执行名额时返回 None，否则返回拒绝原因"""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self._update_gauges()
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.cancelled():
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                self._update_gauges()
+            else:
+                # 名额已转交但请求不再执行，继续转交给下一个
+                self.release()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return "timeout"
+        return None
+
+    def release(self) -> None:
+        # 名额直接转交给队首的请求，active 不变
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(True)
+                self._update_gauges()
+                return
+        self.active -= 1
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        ADMISSION_ACTIVE.set(self.active, route_class=self.name)
+        ADMISSION_WAITING.set(len(self._waiters), route_class=self.name)
+
+
+class AdmissionControlMiddleware:
+    """按路由类别限制并发，排队已满或等待超时时立即返回 503
+
+    这样过载时多余的请求在进入线程池和连接池之前就被拒绝，已接受的请求
+    仍能在超时前完成。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.limiters = {
+            name: RouteClassLimiter(name, concurrency, queue_size)
+            for name, (concurrency, queue_size) in route_class_limits().items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        route_class = None
+        if scope["type"] == "http":
+            route_class = classify_route(scope["method"], scope["path"])
+        limiter = self.limiters.get(route_class)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await limiter.acquire(settings.ADMISSION_QUEUE_TIMEOUT)
+        if reason is not None:
+            ADMISSION_REJECTED.inc(route_class=route_class, reason=reason)
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    @staticmethod
+    async def _reject(send) -> None:
+        body = json.dumps(
+            {"code": 503, "message": "服务繁忙，请稍后重试", "data": None},
+            ensure_ascii=False,
+        ).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(settings.ADMISSION_RETRY_AFTER).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,138 @@
+import datetime
+import random
+from collections import Counter, defaultdict
+from datetime import timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from app.models import CourseModel, CoursePreferenceModel, CourseScheduleModel
+from app.utils.shards import all_enrollments, insert_enrollments
+
+
+def _has_conflict(busy: Dict[int, list], slots: list) -> bool:
+    """判断课程时间段是否与学生已占用的时间段冲突"""
+    for weekday, start_time, end_time in slots:
+        for busy_start, busy_end in busy.get(weekday, ()):
+            if start_time < busy_end and end_time > busy_start:
+                return True
+    return False
+
+
+def run_lottery_allocation(
+    db: Session, seed: Optional[int] = None, batch_size: int = 5000
+) -> dict:
+    """按随机序列独裁规则一次性分配课程名额
+
+    所有学生先被随机排序，然后按轮次依次为每位学生分配其下一个仍有名额
+    且与已选课程无时间冲突的志愿课程。整个过程只读取一次数据库，
+    在内存中完成分配后批量写入选课记录。
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+    rng = random.Random(seed)
+
+    # 课程剩余名额 = 最大人数 - 已选人数，已关闭选课的课程不再分配
+    remaining = {
+        course_id: (max_student_num or 0) - enrolled_count
+        for course_id, max_student_num, enrolled_count in db.query(
+            CourseModel.id, CourseModel.max_student_num, CourseModel.enrolled_count
+        ).filter(CourseModel.closed.is_(False))
+    }
+
+    # 课程时间段
+    course_slots: Dict[int, List[tuple]] = defaultdict(list)
+    for course_id, weekday, start_time, end_time in db.query(
+        CourseScheduleModel.course_id,
+        CourseScheduleModel.weekday,
+        CourseScheduleModel.start_time,
+        CourseScheduleModel.end_time,
+    ):
+        course_slots[course_id].append((weekday, start_time, end_time))
+
+    # 学生已选课程
+    held: Dict[int, set] = defaultdict(set)
+    for student_id, course_id in all_enrollments(db):
+        held[student_id].add(course_id)
+
+    # 学生志愿，按志愿顺序排列
+    preferences: Dict[int, List[int]] = defaultdict(list)
+    for student_id, course_id in db.query(
+        CoursePreferenceModel.student_id, CoursePreferenceModel.course_id
+    ).order_by(CoursePreferenceModel.student_id, CoursePreferenceModel.rank):
+        preferences[student_id].append(course_id)
+
+    order = sorted(preferences)
+    rng.shuffle(order)
+
+    busy: Dict[int, Dict[int, list]] = {}
+    for student_id in order:
+        student_busy: Dict[int, list] = defaultdict(list)
+        for course_id in held[student_id]:
+            for weekday, start_time, end_time in course_slots.get(course_id, ()):
+                student_busy[weekday].append((start_time, end_time))
+        busy[student_id] = student_busy
+
+    # 每轮每位学生最多获得一门课程，轮次之间蛇形反转顺序以保证公平
+    now = datetime.datetime.now(timezone.utc)
+    rows = []
+    cursor = dict.fromkeys(order, 0)
+    active = order
+    while active:
+        next_active = []
+        for student_id in active:
+            student_prefs = preferences[student_id]
+            student_courses = held[student_id]
+            position = cursor[student_id]
+            while position < len(student_prefs):
+                course_id = student_prefs[position]
+                position += 1
+                if course_id in student_courses or remaining.get(course_id, 0) <= 0:
+                    continue
+                slots = course_slots.get(course_id, ())
+                if _has_conflict(busy[student_id], slots):
+                    continue
+
+                remaining[course_id] -= 1
+                student_courses.add(course_id)
+                for weekday, start_time, end_time in slots:
+                    busy[student_id][weekday].append((start_time, end_time))
+                rows.append(
+                    {
+                        "student_id": student_id,
+                        "course_id": course_id,
+                        "enrollment_date": now,
+                    }
+                )
+                next_active.append(student_id)
+                break
+            cursor[student_id] = position
+        active = next_active[::-1]
+
+    # 批量写入选课记录，并在同一事务中更新课程已选人数；分片时选课记录先在各分片提交
+    assigned = Counter(row["course_id"] for row in rows)
+    courses = CourseModel.__table__
+    try:
+        insert_enrollments(db, rows, batch_size)
+        if assigned:
+            db.execute(
+                update(courses)
+                .where(courses.c.id == bindparam("b_course_id"))
+                .values(enrolled_count=courses.c.enrolled_count + bindparam("b_count")),
+                [
+                    {"b_course_id": course_id, "b_count": count}
+                    for course_id, count in assigned.items()
+                ],
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "seed": seed,
+        "students": len(order),
+        "assigned": len(rows),
+        "unassigned_students": len(order) - len({row["student_id"] for row in rows}),
+    }
@@ -0,0 +1,370 @@
+import argparse
+import datetime
+import logging
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from fastapi import Depends, HTTPException, Query, Request
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import (
+    ArchivedCourseModel,
+    ArchivedCourseScheduleModel,
+    ArchivedStudentCourseModel,
+    ArchivedTermModel,
+    CourseModel,
+    CoursePreferenceModel,
+    CourseScheduleModel,
+    StudentCourseModel,
+)
+from app.schemas import Semester
+from app.utils.catalog import (
+    CatalogSnapshot,
+    CourseRecord,
+    ScheduleRecord,
+    Term,
+    bump_catalog_version,
+    catalog_store,
+    get_catalog,
+    select_records,
+)
+from app.utils.init_db import SessionLocal, get_engine
+from app.utils.replicas import open_replica_session
+from app.utils.shards import get_enrollment_shards, route_enrollments
+from app.utils.statements import ARCHIVED_ENROLLED_COURSE_IDS, ENROLLED_COURSE_IDS
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+courses = CourseModel.__table__
+schedules = CourseScheduleModel.__table__
+enrollments = StudentCourseModel.__table__
+courses_archive = ArchivedCourseModel.__table__
+schedules_archive = ArchivedCourseScheduleModel.__table__
+enrollments_archive = ArchivedStudentCourseModel.__table__
+
+
+def _term_condition(table, term: Term):
+    condition = table.c.academic_year == term.academic_year
+    if term.semester is not None:
+        condition = and_(condition, table.c.semester == Semester(term.semester))
+    return condition
+
+
+def _copy(conn: Connection, source, target, condition) -> int:
+    """把 source 中满足条件的行按同名列复制到 target，target 中没有的列不复制"""
+    columns = [column.name for column in source.columns if column.name in target.c]
+    return conn.execute(
+        insert(target).from_select(
+            columns, select(*[source.c[name] for name in columns]).where(condition)
+        )
+    ).rowcount
+
+
+def _copy_sharded_enrollments(conn: Connection, course_ids: List[int]) -> int:
+    """把各分片中这些课程的选课记录写入主库的归档表
+
+    各分片的 ID 会重复，归档表重新分配 ID。
+    """
+    columns = [c for c in enrollments.columns if c.name != "id"]
+    statement = select(*columns).where(enrollments.c.course_id.in_(course_ids))
+    results = get_enrollment_shards().scatter(
+        lambda session, shard: session.execute(statement).mappings().all()
+    )
+    rows = [dict(row) for shard_rows in results for row in shard_rows]
+    if rows:
+        conn.execute(insert(enrollments_archive), rows)
+    return len(rows)
+
+
+def _delete_sharded_enrollments(course_ids: List[int]) -> None:
+    """从各分片删除这些课程的选课记录，重复执行没有副作用"""
+
+    def remove(session: Session, shard) -> None:
+        session.execute(
+            delete(enrollments).where(enrollments.c.course_id.in_(course_ids))
+        )
+        session.commit()
+
+    get_enrollment_shards().scatter(remove)
+
+
+def _cleanup_sharded_enrollments(engine: Engine, term: Term, batch_size: int) -> int:
+    """删除该学期已归档课程在分片中残留的选课记录，返回涉及的课程数
+
+    上次归档时主库已提交、分片删除失败的课程在这里重试。
+    """
+    with engine.connect() as conn:
+        course_ids = list(
+            conn.execute(
+                select(courses_archive.c.id).where(
+                    _term_condition(courses_archive, term),
+                    courses_archive.c.id.notin_(select(courses.c.id)),
+                )
+            ).scalars()
+        )
+    for i in range(0, len(course_ids), batch_size):
+        _delete_sharded_enrollments(course_ids[i : i + batch_size])
+    return len(course_ids)
+
+
+def archive_batch(conn: Connection, course_ids: List[int]) -> Counter:
+    """在一个事务中把一批课程及其时间安排和选课记录移入归档表
+
+    选课记录分片时只在这里复制，由调用方在主库提交后再从各分片删除。
+    """
+    counts = Counter()
+    if get_enrollment_shards().enabled:
+        counts["enrollments"] = _copy_sharded_enrollments(conn, course_ids)
+    else:
+        counts["enrollments"] = _copy(
+            conn,
+            enrollments,
+            enrollments_archive,
+            enrollments.c.course_id.in_(course_ids),
+        )
+    counts["schedules"] = _copy(
+        conn, schedules, schedules_archive, schedules.c.course_id.in_(course_ids)
+    )
+    counts["courses"] = _copy(
+        conn, courses, courses_archive, courses.c.id.in_(course_ids)
+    )
+    # 先删除引用课程的记录，再删除课程；学期结束后的志愿已无意义，直接删除
+    preferences = CoursePreferenceModel.__table__
+    conn.execute(delete(preferences).where(preferences.c.course_id.in_(course_ids)))
+    conn.execute(delete(enrollments).where(enrollments.c.course_id.in_(course_ids)))
+    conn.execute(delete(schedules).where(schedules.c.course_id.in_(course_ids)))
+    conn.execute(delete(courses).where(courses.c.id.in_(course_ids)))
+    return counts
+
+
+def record_archived_term(db: Session, term: Term, counts: Counter) -> None:
+    semester = Semester(term.semester) if term.semester is not None else None
+    row = (
+        db.query(ArchivedTermModel)
+        .filter(
+            ArchivedTermModel.academic_year == term.academic_year,
+            (
+                ArchivedTermModel.semester.is_(None)
+                if semester is None
+                else ArchivedTermModel.semester == semester
+            ),
+        )
+        .first()
+    )
+    if row is None:
+        row = ArchivedTermModel(
+            academic_year=term.academic_year,
+            semester=semester,
+            courses=0,
+            schedules=0,
+            enrollments=0,
+        )
+        db.add(row)
+    # 同一学期可以多次归档（例如补录的课程），数量累加
+    row.courses += counts["courses"]
+    row.schedules += counts["schedules"]
+    row.enrollments += counts["enrollments"]
+    row.archived_at = datetime.datetime.now(datetime.timezone.utc)
+
+
+def check_archivable(db, term: Term) -> None:
+    """检查学期能否归档，db 为会话或连接；不能归档时抛出 ValueError
+
+    未配置当前学期时无法判断哪个学期正在进行，一律拒绝；学期中还有未结课的
+    课程时也拒绝。
+    """
+    if term.academic_year is None:
+        raise ValueError("必须指定要归档的学年")
+    active = Term.active()
+    if active.academic_year is None:
+        raise ValueError("未配置当前学期（ACTIVE_ACADEMIC_YEAR），不能归档")
+    if term.overlaps(active):
+        raise ValueError("不能归档当前学期")
+    today = datetime.datetime.combine(
+        datetime.date.today(), datetime.time.min, tzinfo=datetime.timezone.utc
+    )
+    unfinished = db.execute(
+        select(func.count())
+        .select_from(courses)
+        .where(_term_condition(courses, term), courses.c.end_date >= today)
+    ).scalar()
+    if unfinished:
+        raise ValueError(f"该学期还有 {unfinished} 门课程尚未结课，不能归档")
+
+
+def archive_term(
+    engine: Engine,
+    term: Term,
+    batch_size: Optional[int] = None,
+    pause: Optional[float] = None,
+    on_progress: Optional[Callable[[Counter], None]] = None,
+) -> Dict[str, int]:
+    """分批归档一个学期，每批一个短事务，批次之间暂停以免长时间占用锁"""
+    with engine.connect() as conn:
+        check_archivable(conn, term)
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    pause = settings.ARCHIVE_BATCH_PAUSE if pause is None else pause
+    counts = Counter()
+    sharded = get_enrollment_shards().enabled
+    if sharded:
+        _cleanup_sharded_enrollments(engine, term, batch_size)
+    # 主库已提交、分片删除失败的课程，下次归档该学期时重试
+    cleanup_failed: List[int] = []
+
+    while True:
+        with engine.begin() as conn:
+            course_ids = list(
+                conn.execute(
+                    select(courses.c.id)
+                    .where(_term_condition(courses, term))
+                    .order_by(courses.c.id)
+                    .limit(batch_size)
+                ).scalars()
+            )
+            if not course_ids:
+                break
+            counts.update(archive_batch(conn, course_ids))
+        if sharded:
+            try:
+                _delete_sharded_enrollments(course_ids)
+            except Exception:
+                logger.exception(
+                    "从分片删除已归档的选课记录失败",
+                    extra={"term": str(term), "course_ids": course_ids},
+                )
+                cleanup_failed.extend(course_ids)
+        counts["batches"] += 1
+        logger.info("归档进度", extra={"term": str(term), **counts})
+        if on_progress is not None:
+            on_progress(counts)
+        if pause:
+            time.sleep(pause)
+
+    with Session(engine) as db:
+        record_archived_term(db, term, counts)
+        bump_catalog_version(db)
+        db.commit()
+    catalog_store.invalidate()
+    if cleanup_failed:
+        raise RuntimeError(
+            f"{len(cleanup_failed)} 门课程已归档，但分片中的选课记录删除失败，"
+            f"重新归档该学期会重试: {cleanup_failed}"
+        )
+    return dict(counts)
+
+
+def term_params(
+    academic_year: Optional[int] = Query(None, description="学年，默认为当前学年"),
+    semester: Optional[Semester] = Query(None, description="学期，默认为当前学期"),
+    all_terms: bool = Query(False, description="返回所有未归档学期的数据"),
+) -> Term:
+    """读接口的学期参数，未指定时使用当前学期"""
+    if all_terms:
+        return Term(None, None)
+    if academic_year is None and semester is None:
+        return Term.active()
+    if academic_year is None:
+        academic_year = settings.ACTIVE_ACADEMIC_YEAR
+        if academic_year is None:
+            raise HTTPException(status_code=400, detail="指定学期时需同时指定学年")
+    return Term.of(academic_year, semester)
+
+
+# 归档学期的快照只在查询历史数据时构建，按 (目录版本, 学期) 缓存最近几个
+_archived_catalogs: "OrderedDict[tuple, CatalogSnapshot]" = OrderedDict()
+_archived_catalogs_lock = threading.Lock()
+ARCHIVED_CATALOG_CACHE_SIZE = 8
+
+
+def load_archived_catalog(
+    db: Session, term: Term, catalog: CatalogSnapshot
+) -> CatalogSnapshot:
+    """由归档表构建某个已归档学期的只读快照，教室信息沿用当前快照"""
+    key = (catalog.version, term)
+    with _archived_catalogs_lock:
+        snapshot = _archived_catalogs.get(key)
+        if snapshot is not None:
+            _archived_catalogs.move_to_end(key)
+            return snapshot
+
+    condition = _term_condition(courses_archive, term)
+    snapshot = CatalogSnapshot(
+        catalog.version,
+        select_records(db, ArchivedCourseModel, CourseRecord, condition),
+        select_records(
+            db,
+            ArchivedCourseScheduleModel,
+            ScheduleRecord,
+            schedules_archive.c.course_id.in_(
+                select(courses_archive.c.id).where(condition).scalar_subquery()
+            ),
+        ),
+        catalog.classrooms.values(),
+        catalog.archived_terms,
+        archived=True,
+    )
+    with _archived_catalogs_lock:
+        _archived_catalogs[key] = snapshot
+        while len(_archived_catalogs) > ARCHIVED_CATALOG_CACHE_SIZE:
+            _archived_catalogs.popitem(last=False)
+    return snapshot
+
+
+def get_term_catalog(
+    request: Request,
+    term: Term = Depends(term_params),
+    catalog: CatalogSnapshot = Depends(get_catalog),
+) -> CatalogSnapshot:
+    """请求学期对应的目录快照，已归档的学期从归档表读取
+
+    只有读取已归档学期时才打开数据库会话，读取当前快照不占用连接。
+    """
+    if not catalog.is_archived(term):
+        return catalog
+    db = open_replica_session(request) or SessionLocal(bind=get_engine())
+    try:
+        return load_archived_catalog(db, term, catalog)
+    finally:
+        db.close()
+
+
+def enrolled_course_ids(
+    db: Session, student_id: int, catalog: CatalogSnapshot
+) -> List[int]:
+    """学生已选课程的 ID，归档快照对应归档的选课记录"""
+    if catalog.archived:
+        statement = ARCHIVED_ENROLLED_COURSE_IDS
+    else:
+        statement = ENROLLED_COURSE_IDS
+        route_enrollments(db, student_id)
+    return list(db.scalars(statement, {"student_id": student_id}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把已结束学期的课程移入归档表")
+    parser.add_argument("--academic-year", type=int, required=True)
+    parser.add_argument(
+        "--semester", type=int, choices=[1, 2], help="不指定时归档整个学年"
+    )
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        result = archive_term(
+            get_engine(), Term(args.academic_year, args.semester), args.batch_size
+        )
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    print(
+        f"已归档 {result.get('courses', 0)} 门课程、"
+        f"{result.get('schedules', 0)} 条时间安排、"
+        f"{result.get('enrollments', 0)} 条选课记录"
+    )
@@ -0,0 +1,116 @@
+import datetime
+import logging
+import queue
+import threading
+from typing import List, Optional
+
+from sqlalchemy import insert
+
+from app.config import get_settings
+from app.utils.request_context import get_request_context
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """选课审计日志的异步批量写入器
+
+    请求线程只把记录放入队列，后台线程按批次或时间间隔写入数据库。
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, queue_size: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def record(
+        self,
+        action: str,
+        student_id: Optional[int] = None,
+        course_id: Optional[int] = None,
+        operator_id: Optional[int] = None,
+        detail: Optional[str] = None,
+    ) -> None:
+        if operator_id is None:
+            context = get_request_context()
+            operator_id = context.user_id if context is not None else None
+        row = {
+            "action": action,
+            "student_id": student_id,
+            "course_id": course_id,
+            "operator_id": operator_id,
+            "detail": detail[:500] if detail else detail,
+            "created_at": datetime.datetime.now(datetime.timezone.utc),
+        }
+        self._start_worker()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            logger.error("审计日志队列已满，记录被丢弃", extra={"audit": row})
+
+    def _start_worker(self) -> None:
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._stopping.clear()
+                    self._worker = threading.Thread(
+                        target=self._run, name="audit-writer", daemon=True
+                    )
+                    self._worker.start()
+
+    def _take_batch(self) -> List[dict]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[dict]) -> None:
+        from app.models import EnrollmentAuditModel
+        from app.utils.init_db import get_engine
+
+        try:
+            with get_engine().begin() as conn:
+                conn.execute(insert(EnrollmentAuditModel), batch)
+        except Exception:
+            logger.exception("写入审计日志失败", extra={"rows": len(batch)})
+
+    def stop(self) -> None:
+        """写完队列中剩余的记录后停止后台线程"""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is None:
+            return
+        self._stopping.set()
+        worker.join()
+
+
+audit_writer = AuditWriter(
+    settings.AUDIT_BATCH_SIZE, settings.AUDIT_FLUSH_INTERVAL, settings.AUDIT_QUEUE_SIZE
+)
+
+
+def record_audit(
+    action: str,
+    student_id: Optional[int] = None,
+    course_id: Optional[int] = None,
+    operator_id: Optional[int] = None,
+    detail: Optional[str] = None,
+) -> None:
+    """记录一条选课审计日志，不阻塞调用方；未指定操作人时取当前请求的用户"""
+    audit_writer.record(action, student_id, course_id, operator_id, detail)
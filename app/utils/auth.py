@@ -1,4 +1,7 @@
 import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -10,6 +13,10 @@ from sqlalchemy.orm import Session
 from app.config import get_settings
 from app.models import StudentModel
 from app.utils.init_db import get_db
+from app.utils.metrics import AUTH_CACHE
+from app.utils.request_context import get_request_context
+from app.utils.statements import USER_BY_USERNAME
+from app.utils.tracing import span
 
 settings = get_settings()
 
@@ -47,7 +54,61 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(
+class TokenCache:
+    """已验证令牌的 LRU 缓存，避免每个请求重复解码和验签 JWT"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        # 令牌 -> (用户名, 过期时间戳)
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, token: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            username, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return username
+
+    def put(self, token: str, username: str, expires_at: float) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (username, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+
+def decode_token_username(token: str) -> Optional[str]:
+    """解析令牌中的用户名，令牌无效时返回 None"""
+    username = token_cache.get(token)
+    if username is not None:
+        AUTH_CACHE.inc(result="hit")
+        return username
+    AUTH_CACHE.inc(result="miss")
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    # 签发时总会带上 exp，解码成功即说明尚未过期
+    token_cache.put(token, username, payload.get("exp", time.time()))
+    return username
+
+
+def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
 ) -> StudentModel:
     """获取当前用户信息"""
@@ -56,15 +117,25 @@ async def get_current_user(
         detail="无效的认证凭据",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    with span("auth.decode_token"):
+        username = decode_token_username(token)
+    if username is None:
         raise credentials_exception
 
-    student = db.query(StudentModel).filter(StudentModel.username == username).first()
+    with span("auth.load_user"):
+        student = db.scalars(USER_BY_USERNAME, {"username": username}).first()
     if student is None:
         raise credentials_exception
+    context = get_request_context()
+    if context is not None:
+        context.user_id = student.id
     return student
+
+
+def get_current_admin(
+    current_user: StudentModel = Depends(get_current_user),
+) -> StudentModel:
+    """获取当前管理员用户，非管理员无权访问"""
+    if current_user.username != "admin":
+        raise HTTPException(status_code=403, detail="没有权限执行此操作")
+    return current_user
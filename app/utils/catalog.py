@@ -0,0 +1,473 @@
+import bisect
+import datetime
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import (
+    ArchivedTermModel,
+    CatalogVersionModel,
+    ClassroomModel,
+    CourseModel,
+    CourseScheduleModel,
+)
+from app.utils.response import serialize_value
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+# 目录记录只包含不常变化的字段，已选人数等实时数据仍从数据库读取
+class CourseRecord(NamedTuple):
+    id: int
+    code: str
+    name: str
+    description: Optional[str]
+    teacher: str
+    credits: int
+    max_student_num: int
+    classroom_id: Optional[int]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    start_date: Optional[datetime.datetime]
+    end_date: Optional[datetime.datetime]
+    academic_year: Optional[int]
+    semester: object
+
+
+class Term(NamedTuple):
+    """学年和学期，academic_year 为空表示不限学期，semester 为空表示整个学年"""
+
+    academic_year: Optional[int]
+    semester: Optional[int]
+
+    @classmethod
+    def of(cls, academic_year: Optional[int], semester) -> "Term":
+        # Semester 枚举与 int 的哈希不同，统一转换为 int 便于比较和做字典键
+        return cls(academic_year, int(semester) if semester is not None else None)
+
+    @classmethod
+    def active(cls) -> "Term":
+        return cls.of(settings.ACTIVE_ACADEMIC_YEAR, settings.ACTIVE_SEMESTER)
+
+    def includes(self, course: CourseRecord) -> bool:
+        if self.academic_year is None:
+            return True
+        if course.academic_year != self.academic_year:
+            return False
+        return self.semester is None or course.semester == self.semester
+
+    def overlaps(self, other: "Term") -> bool:
+        if self.academic_year is None or other.academic_year is None:
+            return False
+        if self.academic_year != other.academic_year:
+            return False
+        return (
+            self.semester is None
+            or other.semester is None
+            or self.semester == other.semester
+        )
+
+
+class ScheduleRecord(NamedTuple):
+    id: int
+    course_id: int
+    weekday: int
+    start_time: datetime.time
+    end_time: datetime.time
+
+
+class ClassroomRecord(NamedTuple):
+    id: int
+    name: str
+    capacity: int
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+def record_to_dict(record: NamedTuple, fields: Optional[List[str]] = None) -> dict:
+    """与 model_to_dict 的输出格式一致"""
+    if fields is None:
+        fields = record._fields
+    return {field: serialize_value(getattr(record, field)) for field in fields}
+
+
+def normalize_teacher(name: str) -> str:
+    """教师姓名是自由文本，忽略大小写和多余空白后比较"""
+    return " ".join(name.split()).casefold()
+
+
+class TeacherDaySlots:
+    """某位教师某一天的时间安排，按开始时间排序，用二分查找定位重叠的时间段"""
+
+    __slots__ = ("schedules", "starts", "max_ends")
+
+    def __init__(self, schedules: List[ScheduleRecord]):
+        self.schedules = tuple(
+            sorted(schedules, key=lambda s: (s.start_time, s.end_time, s.id))
+        )
+        self.starts = [schedule.start_time for schedule in self.schedules]
+        # 前缀中最晚的结束时间，历史数据中已有重叠时也能正确停止向前查找
+        self.max_ends = []
+        for schedule in self.schedules:
+            latest = self.max_ends[-1] if self.max_ends else schedule.end_time
+            self.max_ends.append(max(latest, schedule.end_time))
+
+    def overlapping(
+        self, start_time: datetime.time, end_time: datetime.time
+    ) -> List[ScheduleRecord]:
+        # 开始时间早于 end_time 的时间段都在 index 之前
+        index = bisect.bisect_left(self.starts, end_time)
+        result = []
+        for i in range(index - 1, -1, -1):
+            if self.max_ends[i] <= start_time:
+                break
+            if self.schedules[i].end_time > start_time:
+                result.append(self.schedules[i])
+        result.reverse()
+        return result
+
+
+class CatalogSnapshot:
+    """某一版本的课程目录只读快照，创建后不再修改"""
+
+    __slots__ = (
+        "version",
+        "loaded_at",
+        "courses",
+        "classrooms",
+        "schedules_by_course",
+        "course_id_by_code",
+        "course_ids_by_teacher",
+        "course_ids_by_classroom",
+        "teacher_slots",
+        "course_ids_by_term",
+        "archived_terms",
+        "archived",
+    )
+
+    def __init__(
+        self,
+        version: int,
+        courses: List[CourseRecord],
+        schedules: List[ScheduleRecord],
+        classrooms: List[ClassroomRecord],
+        archived_terms: Iterable[Term] = (),
+        archived: bool = False,
+    ):
+        self.version = version
+        self.loaded_at = time.time()
+        # 已归档的学期，以及该快照本身是否由归档表构建
+        self.archived_terms: FrozenSet[Term] = frozenset(archived_terms)
+        self.archived = archived
+        # 按 ID 排序，与数据库默认的主键顺序一致
+        self.courses: Dict[int, CourseRecord] = {
+            course.id: course for course in sorted(courses)
+        }
+        self.classrooms: Dict[int, ClassroomRecord] = {
+            classroom.id: classroom for classroom in sorted(classrooms)
+        }
+
+        schedules_by_course = defaultdict(list)
+        for schedule in sorted(schedules):
+            schedules_by_course[schedule.course_id].append(schedule)
+        self.schedules_by_course: Dict[int, Tuple[ScheduleRecord, ...]] = {
+            course_id: tuple(items) for course_id, items in schedules_by_course.items()
+        }
+
+        by_teacher = defaultdict(list)
+        by_classroom = defaultdict(list)
+        by_term = defaultdict(list)
+        for course in self.courses.values():
+            by_teacher[normalize_teacher(course.teacher)].append(course.id)
+            by_term[Term.of(course.academic_year, course.semester)].append(course.id)
+            if course.classroom_id is not None:
+                by_classroom[course.classroom_id].append(course.id)
+        self.course_id_by_code: Dict[str, int] = {
+            course.code: course.id for course in self.courses.values()
+        }
+        # 与 teacher_slots 一样按规范化的教师姓名索引
+        self.course_ids_by_teacher: Dict[str, Tuple[int, ...]] = {
+            teacher: tuple(ids) for teacher, ids in by_teacher.items()
+        }
+        self.course_ids_by_classroom: Dict[int, Tuple[int, ...]] = {
+            classroom_id: tuple(ids) for classroom_id, ids in by_classroom.items()
+        }
+        self.course_ids_by_term: Dict[Term, Tuple[int, ...]] = {
+            term: tuple(ids) for term, ids in by_term.items()
+        }
+
+        # (规范化的教师姓名, 星期) -> 当天的时间安排
+        by_teacher_day = defaultdict(list)
+        for course_id, items in self.schedules_by_course.items():
+            course = self.courses.get(course_id)
+            if course is None:
+                continue
+            teacher = normalize_teacher(course.teacher)
+            for schedule in items:
+                by_teacher_day[(teacher, schedule.weekday)].append(schedule)
+        self.teacher_slots: Dict[Tuple[str, int], TeacherDaySlots] = {
+            key: TeacherDaySlots(items) for key, items in by_teacher_day.items()
+        }
+
+    def course_by_code(self, code: str) -> Optional[CourseRecord]:
+        course_id = self.course_id_by_code.get(code)
+        return self.courses.get(course_id) if course_id is not None else None
+
+    def courses_by_teacher(self, teacher: str) -> List[CourseRecord]:
+        """教师的课程，姓名忽略大小写和多余空白"""
+        course_ids = self.course_ids_by_teacher.get(normalize_teacher(teacher), ())
+        return [self.courses[i] for i in course_ids]
+
+    def courses_in_classroom(self, classroom_id: int) -> List[CourseRecord]:
+        return [
+            self.courses[i] for i in self.course_ids_by_classroom.get(classroom_id, ())
+        ]
+
+    def courses_in_term(self, term: Term) -> List[CourseRecord]:
+        """某学期的课程，按 ID 排序；academic_year 为空时返回全部课程"""
+        if term.academic_year is None:
+            return list(self.courses.values())
+        course_ids = []
+        for key, ids in self.course_ids_by_term.items():
+            if key.academic_year == term.academic_year and (
+                term.semester is None or key.semester == term.semester
+            ):
+                course_ids.extend(ids)
+        return [self.courses[i] for i in sorted(course_ids)]
+
+    def is_archived(self, term: Term) -> bool:
+        """该学期是否已移入归档表"""
+        if term.academic_year is None:
+            return False
+        whole_year = Term(term.academic_year, None)
+        if term.semester is None:
+            return whole_year in self.archived_terms or all(
+                Term(term.academic_year, s) in self.archived_terms for s in (1, 2)
+            )
+        return term in self.archived_terms or whole_year in self.archived_terms
+
+    def teacher_schedules(self, teacher: str) -> List[ScheduleRecord]:
+        """教师的全部时间安排，按星期和开始时间排序"""
+        teacher = normalize_teacher(teacher)
+        result = []
+        for weekday in range(7):
+            slots = self.teacher_slots.get((teacher, weekday))
+            if slots is not None:
+                result.extend(slots.schedules)
+        return result
+
+    def teacher_conflicts(
+        self,
+        teacher: str,
+        weekday: int,
+        start_time: datetime.time,
+        end_time: datetime.time,
+        exclude_course_id: Optional[int] = None,
+    ) -> List[ScheduleRecord]:
+        """与给定时间段重叠的该教师其他课程的时间安排"""
+        slots = self.teacher_slots.get((normalize_teacher(teacher), weekday))
+        if slots is None:
+            return []
+        return [
+            schedule
+            for schedule in slots.overlapping(start_time, end_time)
+            if schedule.course_id != exclude_course_id
+        ]
+
+    def schedules(self, course_id: int) -> Tuple[ScheduleRecord, ...]:
+        return self.schedules_by_course.get(course_id, ())
+
+    def classroom_of(self, course: CourseRecord) -> Optional[ClassroomRecord]:
+        if course.classroom_id is None:
+            return None
+        return self.classrooms.get(course.classroom_id)
+
+    def course_dict(
+        self,
+        course: CourseRecord,
+        fields: Optional[List[str]] = None,
+        include_schedules: bool = True,
+    ) -> dict:
+        """课程信息及其时间安排"""
+        course_dict = record_to_dict(course, fields)
+        if include_schedules:
+            course_dict["schedules"] = [
+                record_to_dict(schedule) for schedule in self.schedules(course.id)
+            ]
+        return course_dict
+
+
+WEEKDAY_NAMES = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+
+
+def describe_teacher_conflicts(
+    catalog: CatalogSnapshot,
+    teacher: str,
+    slots: Iterable,
+    exclude_course_id: Optional[int] = None,
+) -> List[str]:
+    """检查教师在这些时间段是否已有其他课程，slots 中的元素需有 weekday、start_time、end_time"""
+    conflicts = []
+    for slot in slots:
+        for schedule in catalog.teacher_conflicts(
+            teacher, slot.weekday, slot.start_time, slot.end_time, exclude_course_id
+        ):
+            course = catalog.courses[schedule.course_id]
+            conflicts.append(
+                f"{WEEKDAY_NAMES[slot.weekday]} "
+                f"{slot.start_time.strftime('%H:%M')}-{slot.end_time.strftime('%H:%M')} "
+                f"教师 {course.teacher} 已有课程《{course.name}》"
+                f"({schedule.start_time.strftime('%H:%M')}-{schedule.end_time.strftime('%H:%M')})"
+            )
+    return conflicts
+
+
+def select_records(db: Session, model, record_type, where=None) -> list:
+    """按记录类型的字段读取 model 对应的表"""
+    table = model.__table__
+    statement = select(*[table.c[field] for field in record_type._fields])
+    if where is not None:
+        statement = statement.where(where)
+    return [record_type(*row) for row in db.execute(statement)]
+
+
+def read_archived_terms(db: Session) -> List[Term]:
+    rows = db.execute(
+        select(ArchivedTermModel.academic_year, ArchivedTermModel.semester)
+    )
+    return [Term.of(academic_year, semester) for academic_year, semester in rows]
+
+
+def read_catalog_version(db: Session) -> int:
+    version = db.execute(
+        select(CatalogVersionModel.version).where(CatalogVersionModel.id == 1)
+    ).scalar()
+    return version or 0
+
+
+def load_catalog(db: Session) -> CatalogSnapshot:
+    """在一个事务中读取版本号和目录数据，构建快照"""
+    version = read_catalog_version(db)
+    return CatalogSnapshot(
+        version,
+        select_records(db, CourseModel, CourseRecord),
+        select_records(db, CourseScheduleModel, ScheduleRecord),
+        select_records(db, ClassroomModel, ClassroomRecord),
+        read_archived_terms(db),
+    )
+
+
+def bump_catalog_version(db: Session) -> None:
+    """在当前事务中将目录版本号加一，随写操作一起提交"""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    updated = db.execute(
+        update(CatalogVersionModel)
+        .where(CatalogVersionModel.id == 1)
+        .values(version=CatalogVersionModel.version + 1, updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        db.add(CatalogVersionModel(id=1, version=2, updated_at=now))
+
+
+class CatalogStore:
+    """持有当前的目录快照
+
+    最多每隔 check_interval 秒读取一次版本号，版本变化时由一个线程重建
+    快照后整体替换，其他请求在此期间继续使用旧快照。数据库不可用时继续
+    以只读方式提供最后一次加载的快照。
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, fresh: bool = False) -> CatalogSnapshot:
+        """fresh 为 True 时总是检查版本号，供写操作前的校验使用"""
+        snapshot = self._snapshot
+        if not fresh and snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+        # 已有快照时不等待正在进行的检查
+        if not self._lock.acquire(blocking=fresh or snapshot is None):
+            return snapshot
+        try:
+            snapshot = self._snapshot
+            if (
+                not fresh
+                and snapshot is not None
+                and time.monotonic() < self._next_check
+            ):
+                return snapshot
+            try:
+                snapshot = self._refresh(snapshot)
+            except SQLAlchemyError as e:
+                if snapshot is None:
+                    raise
+                logger.warning(
+                    f"读取课程目录失败，继续使用版本 {snapshot.version} 的快照: {e}"
+                )
+            self._next_check = time.monotonic() + self.check_interval
+            return snapshot
+        finally:
+            self._lock.release()
+
+    def _refresh(self, snapshot: Optional[CatalogSnapshot]) -> CatalogSnapshot:
+        from app.utils.init_db import SessionLocal, get_engine
+
+        with SessionLocal(bind=get_engine()) as db:
+            if snapshot is not None and read_catalog_version(db) == snapshot.version:
+                return snapshot
+            start = time.perf_counter()
+            snapshot = load_catalog(db)
+        self._snapshot = snapshot
+        logger.info(
+            "课程目录已加载",
+            extra={
+                "catalog_version": snapshot.version,
+                "courses": len(snapshot.courses),
+                "load_ms": round((time.perf_counter() - start) * 1000, 1),
+            },
+        )
+        return snapshot
+
+    def invalidate(self) -> None:
+        """本进程修改目录后调用，下一次读取时立即检查版本号"""
+        self._next_check = 0.0
+
+
+catalog_store = CatalogStore(settings.CATALOG_CHECK_INTERVAL)
+
+
+def lock_teacher_courses(db: Session, teacher: str, course_id: int) -> CatalogSnapshot:
+    """在 db 的事务中锁定教师的全部课程行和 course_id，返回加锁后读取的快照
+
+    同一教师的时间安排写操作因此串行执行，加锁后再检查冲突，并发请求不会
+    同时通过检查。SQLite 不支持 FOR UPDATE，写事务本身串行。
+    """
+    catalog = catalog_store.get(fresh=True)
+    course_ids = {
+        course_id,
+        *(course.id for course in catalog.courses_by_teacher(teacher)),
+    }
+    db.execute(
+        select(CourseModel.id)
+        .where(CourseModel.id.in_(sorted(course_ids)))
+        .order_by(CourseModel.id)
+        .with_for_update()
+    )
+    return catalog_store.get(fresh=True)
+
+
+def get_catalog() -> CatalogSnapshot:
+    """获取当前的课程目录快照，可用作路由依赖"""
+    return catalog_store.get()
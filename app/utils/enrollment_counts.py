@@ -0,0 +1,131 @@
+import argparse
+import sys
+from typing import List, Optional
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.models import CourseModel, StudentCourseModel
+from app.utils.shards import course_enrollment_counts, get_enrollment_shards
+
+courses = CourseModel.__table__
+student_courses = StudentCourseModel.__table__
+
+
+def _actual_count():
+    return (
+        select(func.count(student_courses.c.id))
+        .where(student_courses.c.course_id == courses.c.id)
+        .scalar_subquery()
+    )
+
+
+def sync_enrolled_counts(
+    conn: Connection, course_ids: Optional[List[int]] = None
+) -> int:
+    """用选课记录重新计算课程的已选人数，返回更新的课程数
+
+    重新计算与写入在同一条 UPDATE 中完成，不会覆盖并发选课的结果。
+    """
+    stmt = update(courses).values(enrolled_count=_actual_count())
+    if course_ids is not None:
+        stmt = stmt.where(courses.c.id.in_(course_ids))
+    return conn.execute(stmt).rowcount
+
+
+def backfill_enrolled_counts(conn: Connection) -> None:
+    """回填所有课程的已选人数，选课记录分片时按各分片汇总的记录数写入"""
+    if not get_enrollment_shards().enabled:
+        sync_enrolled_counts(conn)
+        return
+    actual = course_enrollment_counts(None)
+    course_ids = conn.execute(select(courses.c.id)).scalars().all()
+    if course_ids:
+        conn.execute(
+            update(courses)
+            .where(courses.c.id == bindparam("b_course_id"))
+            .values(enrolled_count=bindparam("b_count")),
+            [
+                {"b_course_id": course_id, "b_count": actual[course_id]}
+                for course_id in course_ids
+            ],
+        )
+
+
+def find_enrolled_count_drift(conn: Connection) -> List[dict]:
+    """找出已选人数与选课记录不一致的课程"""
+    actual = (
+        select(student_courses.c.course_id, func.count().label("actual"))
+        .group_by(student_courses.c.course_id)
+        .subquery()
+    )
+    rows = conn.execute(
+        select(courses.c.id, courses.c.enrolled_count, actual.c.actual)
+        .outerjoin(actual, actual.c.course_id == courses.c.id)
+        .where(courses.c.enrolled_count != func.coalesce(actual.c.actual, 0))
+    )
+    return [
+        {"course_id": course_id, "stored": stored, "actual": actual or 0}
+        for course_id, stored, actual in rows
+    ]
+
+
+def reconcile_sharded_enrolled_counts(engine: Engine, repair: bool = True) -> dict:
+    """选课记录分片时，汇总各分片的记录数后与主库中的已选人数比较
+
+    计数与修复无法在同一条语句中完成，修复时按偏差增减而不是直接覆盖；
+    核对期间有并发选课时偏差可能不准确，可再核对一次。
+    """
+    actual = course_enrollment_counts(None)
+    with engine.begin() as conn:
+        drift = [
+            {"course_id": course_id, "stored": stored, "actual": actual[course_id]}
+            for course_id, stored in conn.execute(
+                select(courses.c.id, courses.c.enrolled_count)
+            )
+            if stored != actual[course_id]
+        ]
+        if repair and drift:
+            conn.execute(
+                update(courses)
+                .where(courses.c.id == bindparam("b_course_id"))
+                .values(enrolled_count=courses.c.enrolled_count + bindparam("b_delta")),
+                [
+                    {
+                        "b_course_id": item["course_id"],
+                        "b_delta": item["actual"] - item["stored"],
+                    }
+                    for item in drift
+                ],
+            )
+    return {"drift": drift, "repaired": repair and bool(drift)}
+
+
+def reconcile_enrolled_counts(engine: Engine, repair: bool = True) -> dict:
+    """检查已选人数的偏差，repair 为 True 时修复有偏差的课程"""
+    if get_enrollment_shards().enabled:
+        return reconcile_sharded_enrolled_counts(engine, repair)
+    with engine.begin() as conn:
+        drift = find_enrolled_count_drift(conn)
+        if repair and drift:
+            sync_enrolled_counts(conn, [item["course_id"] for item in drift])
+    return {"drift": drift, "repaired": repair and bool(drift)}
+
+
+if __name__ == "__main__":
+    from app.utils.init_db import get_engine
+
+    parser = argparse.ArgumentParser(description="检查并修复课程已选人数")
+    parser.add_argument("--check", action="store_true", help="只检查，不修复")
+    args = parser.parse_args()
+
+    result = reconcile_enrolled_counts(get_engine(), repair=not args.check)
+    for item in result["drift"]:
+        print(
+            f"课程 {item['course_id']}: 记录值 {item['stored']}，实际 {item['actual']}"
+        )
+    if not result["drift"]:
+        print("已选人数全部一致")
+    elif result["repaired"]:
+        print(f"已修复 {len(result['drift'])} 门课程")
+    sys.exit(1 if args.check and result["drift"] else 0)
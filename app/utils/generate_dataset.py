@@ -0,0 +1,337 @@
+import argparse
+import datetime
+import hashlib
+import itertools
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models import (
+    ClassroomModel,
+    CourseModel,
+    CourseScheduleModel,
+    StudentCourseModel,
+    StudentModel,
+)
+from app.schemas import Gender, Semester
+
+# 每天的上课节次
+PERIODS = [
+    (datetime.time(8, 0), datetime.time(9, 40)),
+    (datetime.time(10, 0), datetime.time(11, 40)),
+    (datetime.time(14, 0), datetime.time(15, 40)),
+    (datetime.time(16, 0), datetime.time(17, 40)),
+    (datetime.time(19, 0), datetime.time(20, 40)),
+]
+WEEKDAYS = 5
+SUBJECTS = [
+    "高等数学",
+    "大学英语",
+    "程序设计",
+    "数据结构",
+    "线性代数",
+    "大学物理",
+    "操作系统",
+    "计算机网络",
+    "数据库原理",
+    "概率统计",
+    "经济学原理",
+    "艺术鉴赏",
+]
+MAJORS = ["计算机", "软件工程", "数学", "物理", "经济", "外语"]
+CAPACITIES = [30, 45, 60, 90, 120, 200]
+CAPACITY_WEIGHTS = [25, 20, 25, 15, 10, 5]
+# 课程容量相对平均需求的倍数分布，总容量略高于总选课需求
+CAPACITY_FACTORS = [0.3, 0.6, 1.0, 1.5, 2.5]
+CAPACITY_FACTOR_WEIGHTS = [15, 20, 35, 20, 10]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="生成用于规模测试的模拟数据")
+    parser.add_argument("--scale", type=float, default=1.0, help="整体规模系数")
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--courses", type=int, default=5000)
+    parser.add_argument("--classrooms", type=int, default=500)
+    parser.add_argument(
+        "--enrollments-per-student", type=float, default=10.0, help="每个学生平均选课数"
+    )
+    parser.add_argument(
+        "--popularity-skew",
+        type=float,
+        default=1.0,
+        help="课程热度的 Zipf 指数，越大热门课程越集中",
+    )
+    parser.add_argument(
+        "--slots-per-course", type=int, default=2, help="每门课程最多节次"
+    )
+    parser.add_argument("--academic-year", type=int, default=2024)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--reset", action="store_true", help="清空并重建所有数据表")
+    args = parser.parse_args(argv)
+    args.students = max(1, int(args.students * args.scale))
+    args.courses = max(1, int(args.courses * args.scale))
+    args.classrooms = max(1, int(args.classrooms * args.scale))
+    return args
+
+
+def generate_classrooms(rng: random.Random, args) -> List[dict]:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        {
+            "id": i,
+            "name": f"{rng.choice('ABCDEFGH')}{i:04d}",
+            "capacity": rng.choices(CAPACITIES, CAPACITY_WEIGHTS)[0],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(1, args.classrooms + 1)
+    ]
+
+
+def generate_students(rng: random.Random, args) -> List[dict]:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    password = hashlib.md5("123456".encode()).hexdigest()
+    students = []
+    for i in range(1, args.students + 1):
+        grade = args.academic_year - rng.randrange(4)
+        students.append(
+            {
+                "id": i,
+                "student_number": f"{grade}{i:06d}",
+                "username": f"student{i:06d}",
+                "password": password,
+                "email": f"student{i:06d}@example.com",
+                "gender": rng.choice([Gender.MALE, Gender.FEMALE]),
+                "is_active": rng.random() > 0.01,
+                "enrollment_date": datetime.datetime(grade, 9, 1),
+                "class_name": f"{rng.choice(MAJORS)}{grade}-{rng.randrange(1, 9):02d}班",
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    return students
+
+
+def generate_courses(rng: random.Random, args) -> List[dict]:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    teachers = max(1, args.courses // 3)
+    demand = args.students * args.enrollments_per_student / args.courses
+    mean_capacity = max(demand * 1.2, 60)
+    courses = []
+    for i in range(1, args.courses + 1):
+        semester = rng.choice([Semester.FIRST, Semester.SECOND])
+        year = (
+            args.academic_year if semester == Semester.FIRST else args.academic_year + 1
+        )
+        start = datetime.datetime(year, 9 if semester == Semester.FIRST else 2, 1)
+        courses.append(
+            {
+                "id": i,
+                "code": f"C{i:06d}",
+                "name": f"{rng.choice(SUBJECTS)}{i}",
+                "description": f"模拟课程 {i}",
+                "teacher": f"教师{rng.randrange(1, teachers + 1):05d}",
+                "credits": rng.randint(1, 4),
+                "max_student_num": max(
+                    10,
+                    round(
+                        mean_capacity
+                        * rng.choices(CAPACITY_FACTORS, CAPACITY_FACTOR_WEIGHTS)[0]
+                    ),
+                ),
+                "classroom_id": rng.randrange(1, args.classrooms + 1),
+                "start_date": start,
+                "end_date": start + datetime.timedelta(weeks=18),
+                "academic_year": args.academic_year,
+                "semester": semester,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    return courses
+
+
+def generate_schedules(
+    rng: random.Random, args, courses: List[dict]
+) -> Dict[int, List[tuple]]:
+    """为每门课程生成互不重叠的节次，返回 课程ID -> [(星期, 节次)]
+
+    同一教师的课程之间也不重叠，与创建时间安排时的教师冲突检查一致。
+    """
+    all_slots = [(w, p) for w in range(WEEKDAYS) for p in range(len(PERIODS))]
+    busy_by_teacher = defaultdict(set)
+    slots = {}
+    for course in courses:
+        busy = busy_by_teacher[course["teacher"]]
+        free = [slot for slot in all_slots if slot not in busy]
+        count = min(rng.randint(1, args.slots_per_course), len(free))
+        slots[course["id"]] = rng.sample(free, count)
+        busy.update(slots[course["id"]])
+    return slots
+
+
+def generate_enrollments(
+    rng: random.Random, args, courses: List[dict], slots: Dict[int, List[tuple]]
+) -> List[tuple]:
+    """按 Zipf 热度分布为学生分配课程，保证容量、唯一性和无时间冲突"""
+    course_ids = [course["id"] for course in courses]
+    # 打乱热度排名，避免热门课程总是 ID 最小的课程
+    ranks = course_ids[:]
+    rng.shuffle(ranks)
+    cum_weights = list(
+        itertools.accumulate(
+            1 / (rank**args.popularity_skew) for rank in range(1, len(ranks) + 1)
+        )
+    )
+    remaining = {course["id"]: course["max_student_num"] for course in courses}
+
+    enrollments = []
+    for student_id in range(1, args.students + 1):
+        mean = args.enrollments_per_student
+        target = max(0, round(rng.gauss(mean, mean * 0.2)))
+        chosen = set()
+        busy = set()
+        attempts = 0
+        while len(chosen) < target and attempts < target * 20:
+            attempts += 1
+            course_id = rng.choices(ranks, cum_weights=cum_weights)[0]
+            if course_id in chosen or remaining[course_id] <= 0:
+                continue
+            course_slots = slots[course_id]
+            if any(slot in busy for slot in course_slots):
+                continue
+            chosen.add(course_id)
+            busy.update(course_slots)
+            remaining[course_id] -= 1
+            enrollments.append((student_id, course_id))
+    return enrollments
+
+
+def bulk_insert(engine: Engine, model, rows: List[dict], batch_size: int) -> None:
+    for i in range(0, len(rows), batch_size):
+        with engine.begin() as conn:
+            conn.execute(insert(model), rows[i : i + batch_size])
+
+
+def write_enrollments(engine: Engine, model, rows: List[dict], batch_size: int) -> None:
+    """选课记录分片时按学生写入各分片"""
+    from app.utils.shards import get_enrollment_shards, insert_enrollments
+
+    shards = get_enrollment_shards()
+    if not shards.enabled:
+        bulk_insert(engine, model, rows, batch_size)
+        return
+    shards.create_tables()
+    with Session(engine) as db:
+        insert_enrollments(db, rows, batch_size)
+
+
+def load_dataset(engine: Engine, args) -> Dict[str, dict]:
+    """生成并批量写入模拟数据，返回每张表的行数和耗时"""
+    rng = random.Random(args.seed)
+    report = {}
+
+    def timed(name: str, model, rows: List[dict], write=bulk_insert) -> None:
+        start = time.perf_counter()
+        write(engine, model, rows, args.batch_size)
+        report[name] = {
+            "rows": len(rows),
+            "seconds": round(time.perf_counter() - start, 2),
+        }
+
+    timed("classrooms", ClassroomModel, generate_classrooms(rng, args))
+    timed("students", StudentModel, generate_students(rng, args))
+    courses = generate_courses(rng, args)
+    slots = generate_schedules(rng, args, courses)
+    enrollments = generate_enrollments(rng, args, courses, slots)
+
+    # 课程的已选人数与生成的选课记录保持一致
+    enrolled = Counter(course_id for _, course_id in enrollments)
+    for course in courses:
+        course["enrolled_count"] = enrolled[course["id"]]
+    timed("courses", CourseModel, courses)
+
+    timed(
+        "course_schedules",
+        CourseScheduleModel,
+        [
+            {
+                "course_id": course_id,
+                "weekday": weekday,
+                "start_time": PERIODS[period][0],
+                "end_time": PERIODS[period][1],
+            }
+            for course_id, course_slots in slots.items()
+            for weekday, period in course_slots
+        ],
+    )
+
+    enrollment_date = datetime.datetime(args.academic_year, 9, 1)
+    timed(
+        "student_courses",
+        StudentCourseModel,
+        [
+            {
+                "student_id": student_id,
+                "course_id": course_id,
+                "enrollment_date": enrollment_date,
+            }
+            for student_id, course_id in enrollments
+        ],
+        write_enrollments,
+    )
+
+    # 通知运行中的服务重新加载课程目录
+    from app.utils.catalog import bump_catalog_version
+
+    with Session(engine) as db:
+        bump_catalog_version(db)
+        db.commit()
+    return report
+
+
+def reset_schema(engine: Engine) -> None:
+    from app.utils.init_db import Base
+    from app.utils.migrations import migration_metadata
+
+    Base.metadata.drop_all(engine)
+    migration_metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    from app.utils.shards import get_enrollment_shards, shard_metadata
+
+    for shard in get_enrollment_shards().shards:
+        shard_metadata.drop_all(shard.engine)
+        shard_metadata.create_all(shard.engine)
+
+
+if __name__ == "__main__":
+    from app.utils.init_db import get_engine, insert_admin_account
+
+    args = parse_args()
+    engine = get_engine()
+
+    if args.reset:
+        reset_schema(engine)
+    else:
+        from app.utils.init_db import Base
+
+        Base.metadata.create_all(engine)
+        with engine.connect() as conn:
+            if conn.execute(select(func.count()).select_from(StudentModel)).scalar():
+                print("错误: 数据库中已有数据，请使用 --reset 清空后再生成")
+                sys.exit(1)
+
+    started = time.perf_counter()
+    report = load_dataset(engine, args)
+    insert_admin_account()
+    for name, item in report.items():
+        print(f"{name}: {item['rows']} 行，耗时 {item['seconds']} 秒")
+    print(f"总耗时 {time.perf_counter() - started:.2f} 秒")
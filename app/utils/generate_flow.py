@@ -4,7 +4,16 @@ from typing import Dict, List, Union, get_args, get_origin
 
 from fastapi import APIRouter
 
-from app.routers import auth, classrooms, courses, schedules, students
+from app.routers import (
+    admin,
+    auth,
+    classrooms,
+    courses,
+    jobs,
+    preferences,
+    schedules,
+    students,
+)
 
 
 def get_type_name(annotation) -> str:
@@ -56,6 +65,9 @@ def generate_flow_diagram(output_file: str = "flow_diagram.puml") -> None:
         "Students": students.router,
         "Classrooms": classrooms.router,
         "Schedules": schedules.router,
+        "Preferences": preferences.router,
+        "Jobs": jobs.router,
+        "Admin": admin.router,
     }
 
     try:
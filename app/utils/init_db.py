@@ -1,14 +1,22 @@
 import hashlib
-
-import mysql.connector
-from mysql.connector import Error
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from app.config import get_settings
+from app.utils.db_pool import InstrumentedQueuePool
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 
 def get_password_md5(password: str) -> str:
@@ -16,48 +24,154 @@ def get_password_md5(password: str) -> str:
     return hashlib.md5(password.encode()).hexdigest()
 
 
-def create_database_if_not_exists():
-    try:
-        conn = mysql.connector.connect(
-            host=settings.DB_HOST,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            port=settings.DB_PORT,
-        )
+# 应用可用的 MySQL 驱动及对应的 SQLAlchemy 方言
+MYSQL_DRIVERS = {
+    "mysqlconnector": "mysql+mysqlconnector",
+    "pymysql": "mysql+pymysql",
+    "mysqldb": "mysql+mysqldb",
+}
+# 异步驱动需要配合 create_async_engine 使用，应用目前只在基准测试中使用
+ASYNC_MYSQL_DRIVERS = {
+    "aiomysql": "mysql+aiomysql",
+    "asyncmy": "mysql+asyncmy",
+}
+
+
+def mysql_url(driver: Optional[str] = None, database: Optional[str] = None) -> URL:
+    """使用 MySQL 配置和指定驱动拼接连接 URL，database 为空时只连接到服务器"""
+    driver = driver or settings.DB_DRIVER
+    drivername = MYSQL_DRIVERS.get(driver) or ASYNC_MYSQL_DRIVERS.get(driver)
+    if drivername is None:
+        raise ValueError(f"不支持的 MySQL 驱动: {driver}")
+    return URL.create(
+        drivername,
+        username=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        database=database,
+    )
 
-        if conn.is_connected():
-            cursor = conn.cursor()
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {settings.DB_NAME}")
-            cursor.close()
-            conn.close()
 
-    except Error as e:
+def create_database_if_not_exists():
+    """通过配置的驱动连接 MySQL 服务器，确保数据库存在"""
+    engine = create_engine(
+        mysql_url(),
+        poolclass=NullPool,
+        isolation_level="AUTOCOMMIT",
+        connect_args={"connect_timeout": settings.DB_CONNECT_TIMEOUT},
+    )
+    try:
+        with engine.connect() as conn:
+            conn.execute(text(f"CREATE DATABASE IF NOT EXISTS `{settings.DB_NAME}`"))
+    except SQLAlchemyError as e:
         raise Exception(f"数据库初始化错误: {str(e)}")
+    finally:
+        engine.dispose()
+
 
+def get_database_url() -> str:
+    """获取数据库连接URL，未配置 DATABASE_URL 时使用 MySQL 配置拼接"""
+    if settings.DATABASE_URL:
+        return settings.DATABASE_URL
+    if settings.DB_DRIVER not in MYSQL_DRIVERS:
+        raise ValueError(
+            f"DB_DRIVER 必须是 {', '.join(MYSQL_DRIVERS)} 之一，当前为 {settings.DB_DRIVER}"
+        )
+    return mysql_url(database=settings.DB_NAME).render_as_string(hide_password=False)
 
-# 确保数据库存在（可选，如果连接失败则跳过）
-try:
-    create_database_if_not_exists()
-except Exception as e:
-    print(f"警告: 数据库初始化失败，将在运行时重试: {str(e)}")
 
-# 构建MySQL连接URL，使用mysql-connector-python驱动
-SQLALCHEMY_DATABASE_URL = f"mysql+mysqlconnector://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 会话工厂在引擎首次创建时绑定，导入本模块不会连接数据库
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
 
-def init_database():
+def get_engine() -> Engine:
+    """获取数据库引擎，首次调用时才创建"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = get_database_url()
+                connect_args = {}
+                if url.startswith("mysql"):
+                    connect_args["connect_timeout"] = settings.DB_CONNECT_TIMEOUT
+                _engine = create_engine(
+                    url,
+                    poolclass=InstrumentedQueuePool,
+                    pool_size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_MAX_OVERFLOW,
+                    pool_timeout=settings.DB_POOL_TIMEOUT,
+                    pool_recycle=settings.DB_POOL_RECYCLE,
+                    pool_pre_ping=settings.DB_POOL_PRE_PING,
+                    connect_args=connect_args,
+                )
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+class StartupReport:
+    """记录启动过程中各阶段的耗时"""
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.phases)
+
+
+def init_database(report: Optional[StartupReport] = None) -> StartupReport:
+    from app.utils.migrations import run_migrations
+
+    report = report or StartupReport()
+
+    # 只有使用 MySQL 配置时才需要确保数据库存在
+    if not settings.DATABASE_URL:
+        with report.phase("创建数据库"):
+            create_database_if_not_exists()
+
+    with report.phase("创建连接引擎"):
+        engine = get_engine()
+        with engine.connect():
+            pass
+
     # 导入 models 以确保所有模型都被注册
-    Base.metadata.create_all(bind=engine)
-    insert_admin_account()
+    import app.models  # noqa: F401
+
+    with report.phase("创建数据表"):
+        Base.metadata.create_all(bind=engine)
+
+    if settings.ENROLLMENT_SHARD_URLS:
+        from app.utils.shards import get_enrollment_shards
+
+        with report.phase("创建选课记录分片表"):
+            get_enrollment_shards().create_tables()
+
+    # 为已存在的数据库补充新增的索引和约束
+    with report.phase("执行数据库迁移"):
+        run_migrations(engine)
+
+    with report.phase("初始化管理员账号"):
+        insert_admin_account()
+
+    return report
 
 
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
@@ -67,7 +181,7 @@ def get_db():
 def insert_admin_account():
     from app.models import StudentModel  # 在函数内部导入
 
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         admin = db.query(StudentModel).filter(StudentModel.username == "admin").first()
         if not admin:
@@ -76,9 +190,9 @@ def insert_admin_account():
             )
             db.add(default_admin)
             db.commit()
-            print("已创建默认管理员账号")
+            logger.info("已创建默认管理员账号")
     except Exception as e:
         db.rollback()
-        print(f"创建管理员账号失败: {str(e)}")
+        logger.error(f"创建管理员账号失败: {str(e)}")
     finally:
         db.close()
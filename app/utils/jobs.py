@@ -0,0 +1,388 @@
+import datetime
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Set, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import or_, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import CourseModel, CourseScheduleModel, JobModel
+from app.schemas import (
+    ArchiveTermJobParams,
+    DeleteCourseJobParams,
+    LotteryAllocationJobParams,
+    ReconcileJobParams,
+)
+from app.utils.allocation import run_lottery_allocation
+from app.utils.archive import archive_term
+from app.utils.audit import record_audit
+from app.utils.catalog import Term, bump_catalog_version, catalog_store
+from app.utils.enrollment_counts import reconcile_enrolled_counts
+from app.utils.metrics import Counter, registry
+from app.utils.response import model_to_dict
+from app.utils.seats import seat_broadcaster
+from app.utils.shards import course_enrollment_counts, delete_course_enrollments
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+JOBS_FINISHED = registry.register(
+    Counter("jobs_finished", "已结束的后台任务", ("type", "status"))
+)
+
+# 尚未结束的任务状态
+ACTIVE_STATUSES = ("pending", "running")
+
+# 任务类型 -> 任务函数，任务函数的第一个参数为 JobContext，其余为任务参数
+JOB_HANDLERS: Dict[str, Callable] = {}
+# 任务类型 -> 参数模型
+JOB_PARAMS: Dict[str, Type[BaseModel]] = {}
+# 可以通过 POST /api/jobs 直接提交的任务类型，其余只能由带前置检查的接口提交
+API_JOB_TYPES: Set[str] = set()
+
+
+def job_handler(job_type: str, params_model: Type[BaseModel], api: bool = True):
+    """注册任务函数及其参数模型"""
+
+    def decorator(fn: Callable) -> Callable:
+        JOB_HANDLERS[job_type] = fn
+        JOB_PARAMS[job_type] = params_model
+        if api:
+            API_JOB_TYPES.add(job_type)
+        return fn
+
+    return decorator
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class JobContext:
+    """传给任务函数的上下文，用于报告进度"""
+
+    def __init__(self, job_id: int, engine: Engine, created_by: Optional[int]):
+        self.job_id = job_id
+        self.engine = engine
+        self.created_by = created_by
+
+    def update_progress(self, progress: int, total: Optional[int] = None) -> None:
+        values = {"progress": progress}
+        if total is not None:
+            values["total"] = total
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(JobModel).where(JobModel.id == self.job_id).values(**values)
+            )
+
+
+def _owner_exited(owner: str) -> bool:
+    """判断同一主机上的任务执行进程是否已退出，其他主机上的进程无法判断"""
+    host, pid, token = (owner.split(":") + ["", ""])[:3]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        # 进程号相同而标识不同，是重启前的同一进程（例如容器中的 1 号进程）
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def job_to_dict(job: JobModel) -> dict:
+    job_dict = model_to_dict(job)
+    for field in ("params", "result"):
+        if job_dict[field] is not None:
+            job_dict[field] = json.loads(job_dict[field])
+    return job_dict
+
+
+class JobRunner:
+    """在进程内的线程池中执行后台任务，任务状态保存在 jobs 表
+
+    提交任务只写入一行记录后立即返回，任务函数自行分批提交，不持有长事务。
+    每个任务记录执行进程，执行期间后台线程定期更新心跳；多个工作进程共用
+    数据库时，只有执行进程已退出或心跳超时的任务才会被标记为失败。
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex[:8]
+
+    @property
+    def owner(self) -> str:
+        """当前进程的标识，fork 出的工作进程进程号不同"""
+        return f"{socket.gethostname()}:{os.getpid()}:{self._token}"
+
+    def submit(
+        self,
+        db: Session,
+        job_type: str,
+        params: dict,
+        created_by: Optional[int] = None,
+    ) -> JobModel:
+        """校验参数并创建任务，参数不正确时抛出 ValueError"""
+        params_model = JOB_PARAMS.get(job_type)
+        if params_model is None:
+            raise ValueError(f"未知的任务类型: {job_type}")
+        try:
+            params = params_model.model_validate(params).model_dump(mode="json")
+        except ValidationError as e:
+            raise ValueError(f"任务参数错误: {e.errors()}")
+
+        job = JobModel(
+            type=job_type,
+            status="pending",
+            params=json.dumps(params, ensure_ascii=False),
+            created_by=created_by,
+            owner=self.owner,
+            heartbeat_at=_now(),
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._get_executor().submit(self._run, job.id)
+        return job
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="job"
+                    )
+                    self._stopped.clear()
+                    self._heartbeat = threading.Thread(
+                        target=self._heartbeat_loop, name="job-heartbeat", daemon=True
+                    )
+                    self._heartbeat.start()
+        return self._executor
+
+    def _heartbeat_loop(self) -> None:
+        """定期更新本进程任务的心跳，并回收其他已退出进程遗留的任务"""
+        from app.utils.init_db import get_engine
+
+        while not self._stopped.wait(settings.JOB_HEARTBEAT_INTERVAL):
+            try:
+                engine = get_engine()
+                with engine.begin() as conn:
+                    conn.execute(
+                        update(JobModel)
+                        .where(
+                            JobModel.owner == self.owner,
+                            JobModel.status.in_(ACTIVE_STATUSES),
+                        )
+                        .values(heartbeat_at=_now())
+                    )
+                self.recover(engine)
+            except Exception:
+                logger.exception("更新后台任务心跳失败")
+
+    def _run(self, job_id: int) -> None:
+        from app.utils.init_db import get_engine
+
+        engine = get_engine()
+        with Session(engine) as db:
+            job = db.get(JobModel, job_id)
+            if job.status != "pending":
+                # 排队期间已被判定为中断
+                return
+            job.status = "running"
+            job.started_at = _now()
+            job.heartbeat_at = _now()
+            db.commit()
+            job_type, params, created_by = (
+                job.type,
+                json.loads(job.params),
+                job.created_by,
+            )
+
+        try:
+            result = JOB_HANDLERS[job_type](
+                JobContext(job_id, engine, created_by), **params
+            )
+            values = {
+                "status": "succeeded",
+                "result": json.dumps(result, ensure_ascii=False, default=str),
+            }
+        except Exception as e:
+            logger.exception("后台任务失败", extra={"job_id": job_id, "type": job_type})
+            values = {"status": "failed", "error": str(e)[:500]}
+        with engine.begin() as conn:
+            # 心跳超时被判定为中断的任务不再覆盖状态
+            conn.execute(
+                update(JobModel)
+                .where(JobModel.id == job_id, JobModel.status == "running")
+                .values(finished_at=_now(), **values)
+            )
+        JOBS_FINISHED.inc(type=job_type, status=values["status"])
+
+    def recover(self, engine: Engine) -> int:
+        """把执行进程已退出的未完成任务标记为失败，返回任务数
+
+        同一主机上执行进程已不存在，或心跳超过 JOB_HEARTBEAT_TIMEOUT 未更新
+        的任务视为中断；其他存活进程的任务不受影响。
+        """
+        not_mine = or_(JobModel.owner.is_(None), JobModel.owner != self.owner)
+        cutoff = _now() - datetime.timedelta(seconds=settings.JOB_HEARTBEAT_TIMEOUT)
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(JobModel.id, JobModel.owner).where(
+                    JobModel.status.in_(ACTIVE_STATUSES), not_mine
+                )
+            ).all()
+            exited = [row.id for row in rows if row.owner and _owner_exited(row.owner)]
+            return conn.execute(
+                update(JobModel)
+                .where(
+                    JobModel.status.in_(ACTIVE_STATUSES),
+                    not_mine,
+                    or_(
+                        JobModel.id.in_(exited),
+                        JobModel.heartbeat_at.is_(None),
+                        JobModel.heartbeat_at < cutoff,
+                    ),
+                )
+                .values(
+                    status="failed", error="执行进程退出，任务中断", finished_at=_now()
+                )
+            ).rowcount
+
+    def shutdown(self) -> None:
+        """不再执行排队中的任务，正在执行的任务会继续到结束"""
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+job_runner = JobRunner(settings.JOB_WORKERS)
+
+
+def _reopen_course(engine: Engine, course_id: int) -> None:
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                update(CourseModel)
+                .where(CourseModel.id == course_id)
+                .values(closed=False)
+            )
+    except Exception:
+        logger.exception("重新开放课程失败", extra={"course_id": course_id})
+    seat_broadcaster.mark_changed(course_id)
+
+
+@job_handler("delete_course", DeleteCourseJobParams)
+def delete_course_job(ctx: JobContext, course_id: int) -> dict:
+    """先关闭选课，再分批删除课程的选课记录，最后在一个短事务中删除时间安排和课程
+
+    每批删除后同步减少已选人数，删除过程中课程的已选人数与选课记录保持一致。
+    中途失败时重新开放选课，已删除的选课记录不恢复，重新提交任务可继续删除。
+    """
+    with Session(ctx.engine) as db:
+        course = db.get(CourseModel, course_id)
+        if course is None:
+            raise ValueError("课程不存在")
+        course_name = course.name
+        # 关闭后选课的条件更新不再成功，之前已占用名额的选课随最后一批删除
+        course.closed = True
+        db.commit()
+        total = course_enrollment_counts(db, [course_id])[course_id]
+    seat_broadcaster.mark_changed(course_id)
+    try:
+        ctx.update_progress(0, total)
+
+        dropped = 0
+
+        def record_dropped(student_ids) -> None:
+            for student_id in student_ids:
+                record_audit(
+                    "drop", student_id, course_id, ctx.created_by, detail="课程被删除"
+                )
+
+        while True:
+            with Session(ctx.engine) as db:
+                student_ids = delete_course_enrollments(
+                    db, course_id, settings.JOB_BATCH_SIZE
+                )
+                if student_ids:
+                    # 未分片时与删除在同一事务中提交；分片时各分片已先提交
+                    db.execute(
+                        update(CourseModel)
+                        .where(CourseModel.id == course_id)
+                        .values(
+                            enrolled_count=CourseModel.enrolled_count - len(student_ids)
+                        )
+                    )
+                db.commit()
+            if not student_ids:
+                break
+            dropped += len(student_ids)
+            record_dropped(student_ids)
+            ctx.update_progress(dropped, max(total, dropped))
+
+        with Session(ctx.engine) as db:
+            # 关闭前已占用名额、之后才提交的选课记录随课程一起删除
+            student_ids = delete_course_enrollments(db, course_id)
+            db.query(CourseScheduleModel).filter(
+                CourseScheduleModel.course_id == course_id
+            ).delete()
+            db.query(CourseModel).filter(CourseModel.id == course_id).delete()
+            bump_catalog_version(db)
+            db.commit()
+    except Exception:
+        # 删除未完成时重新开放选课，已删除的选课记录和已选人数保持一致
+        _reopen_course(ctx.engine, course_id)
+        raise
+    catalog_store.invalidate()
+    dropped += len(student_ids)
+    record_dropped(student_ids)
+    record_audit("delete_course", None, course_id, ctx.created_by, detail=course_name)
+    seat_broadcaster.mark_changed(course_id)
+    ctx.update_progress(dropped, dropped)
+    return {"course_id": course_id, "dropped_enrollments": dropped}
+
+
+@job_handler("archive_term", ArchiveTermJobParams)
+def archive_term_job(
+    ctx: JobContext, academic_year: int, semester: Optional[int] = None
+) -> dict:
+    return archive_term(
+        ctx.engine,
+        Term.of(academic_year, semester),
+        on_progress=lambda counts: ctx.update_progress(counts["courses"]),
+    )
+
+
+@job_handler("reconcile_enrolled_counts", ReconcileJobParams)
+def reconcile_enrolled_counts_job(ctx: JobContext, repair: bool = True) -> dict:
+    return reconcile_enrolled_counts(ctx.engine, repair)
+
+
+# 抽签需要先检查选课模式和志愿填报时间，只能通过 POST /api/preferences/allocate 提交
+@job_handler("lottery_allocation", LotteryAllocationJobParams, api=False)
+def lottery_allocation_job(ctx: JobContext, seed: Optional[int] = None) -> dict:
+    with Session(ctx.engine) as db:
+        result = run_lottery_allocation(db, seed=seed)
+    record_audit(
+        "allocate",
+        operator_id=ctx.created_by,
+        detail=f"seed={result['seed']} assigned={result['assigned']}",
+    )
+    return result
@@ -0,0 +1,122 @@
+import atexit
+import copy
+import datetime
+import json
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from app.config import get_settings
+from app.utils.request_context import get_request_context
+
+settings = get_settings()
+
+# LogRecord 自带的属性，其余属性视为通过 extra 传入的结构化字段
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志格式化为单行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        elif record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """在产生日志的线程中补充当前请求的路由和用户"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = get_request_context()
+        if context is not None:
+            if not hasattr(record, "route"):
+                record.route = context.route_key
+            if not hasattr(record, "user_id") and context.user_id is not None:
+                record.user_id = context.user_id
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """队列满时丢弃日志而不是阻塞请求线程"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 只合并消息参数，保留结构化字段，异常堆栈转为文本后再跨线程传递
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[DroppingQueueHandler] = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging() -> None:
+    """配置根日志：请求线程只把日志放入队列，由后台线程负责格式化和写出"""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return
+        formatter = JsonFormatter()
+        handlers = [logging.StreamHandler(sys.stdout)]
+        if settings.LOG_FILE:
+            handlers.append(logging.FileHandler(settings.LOG_FILE, encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(RequestContextFilter())
+        root = logging.getLogger()
+        root.addHandler(_queue_handler)
+        root.setLevel(settings.LOG_LEVEL)
+
+        _listener = QueueListener(
+            _queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """写出队列中剩余的日志并停止后台线程"""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        _listener = None
+        _queue_handler = None
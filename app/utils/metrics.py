@@ -0,0 +1,263 @@
+import bisect
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Prometheus 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """进程内指标的基类，按标签值分组保存数据"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    @property
+    def exposed_name(self) -> str:
+        return self.name
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.exposed_name} {self.documentation}",
+            f"# TYPE {self.exposed_name} {self.type}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    @property
+    def exposed_name(self) -> str:
+        return f"{self.name}_total"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            (self.exposed_name, _format_labels(self.labelnames, key), value)
+            for key, value in items
+        ]
+
+
+class Gauge(Metric):
+    """可增可减的瞬时值"""
+
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            (self.name, _format_labels(self.labelnames, key), value)
+            for key, value in items
+        ]
+
+
+class Histogram(Metric):
+    """按分桶累计观测值的直方图"""
+
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各分桶计数..., 总和, 总数]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(data)) for key, data in self._values.items()]
+        samples = []
+        labelnames = self.labelnames + ("le",)
+        for key, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), data):
+                cumulative += count
+                samples.append(
+                    (
+                        f"{self.name}_bucket",
+                        _format_labels(labelnames, key + (_format_value(bound),)),
+                        cumulative,
+                    )
+                )
+            labels = _format_labels(self.labelnames, key)
+            samples.append((f"{self.name}_sum", labels, data[-2]))
+            samples.append((f"{self.name}_count", labels, data[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表，渲染为 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """注册在每次抓取前执行的采集函数，用于刷新按需计算的指标"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP 请求处理耗时（秒）",
+        ("method", "route", "status"),
+    )
+)
+REQUESTS_IN_FLIGHT = registry.register(
+    Gauge("http_requests_in_flight", "正在处理中的 HTTP 请求数")
+)
+UNHANDLED_EXCEPTIONS = registry.register(
+    Counter("http_unhandled_exceptions", "未处理异常次数", ("exception",))
+)
+ENROLLMENT_OUTCOMES = registry.register(
+    Counter("course_enrollments", "先到先得选课结果", ("outcome",))
+)
+AUTH_CACHE = registry.register(
+    Counter("auth_token_cache_requests", "令牌验证缓存的命中情况", ("result",))
+)
+DB_POOL = registry.register(
+    Gauge(
+        "db_pool_connections",
+        "数据库连接池连接数",
+        ("database", "state"),
+    )
+)
+DB_POOL_CHECKOUTS = registry.register(
+    Gauge("db_pool_checkouts", "数据库连接池累计获取连接次数", ("database",))
+)
+DB_POOL_TIMEOUTS = registry.register(
+    Gauge("db_pool_timeouts", "数据库连接池累计获取连接超时次数", ("database",))
+)
+DB_POOL_WAIT = registry.register(
+    Gauge(
+        "db_pool_wait_seconds",
+        "数据库连接池累计等待连接时间（秒）",
+        ("database",),
+    )
+)
+
+
+def _collect_pool(database: str, status: dict) -> None:
+    for state in ("checked_in", "checked_out", "overflow"):
+        if state in status:
+            DB_POOL.set(status[state], database=database, state=state)
+    if "checkouts" in status:
+        DB_POOL_CHECKOUTS.set(status["checkouts"], database=database)
+        DB_POOL_TIMEOUTS.set(status["timeouts"], database=database)
+        DB_POOL_WAIT.set(status["total_wait_seconds"], database=database)
+
+
+def collect_db_pools() -> None:
+    """抓取时读取主库、副本和选课记录分片连接池的实时状态"""
+    from app.utils.db_pool import pool_status
+    from app.utils.init_db import get_engine
+    from app.utils.replicas import get_replica_router
+    from app.utils.shards import get_enrollment_shards
+
+    for gauge in (DB_POOL, DB_POOL_CHECKOUTS, DB_POOL_TIMEOUTS, DB_POOL_WAIT):
+        gauge.clear()
+    _collect_pool("primary", pool_status(get_engine()))
+    for index, replica in enumerate(get_replica_router().status()):
+        _collect_pool(f"replica{index}", replica["pool"])
+    for shard in get_enrollment_shards().status():
+        _collect_pool(f"shard{shard['index']}", shard["pool"])
+
+
+registry.add_collector(collect_db_pools)
@@ -0,0 +1,266 @@
+import argparse
+import datetime
+import sys
+from datetime import timezone
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    insert,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.utils import statements
+
+# 迁移记录表单独使用一个 MetaData，不参与 create_all 和 ER 图生成
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200)),
+    Column("applied_at", DateTime),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """注册一个版本化的数据库迁移"""
+
+    def decorator(func: Callable[[Connection], None]):
+        MIGRATIONS.append(Migration(version, description, func))
+        return func
+
+    return decorator
+
+
+def create_missing_indexes(conn: Connection, table: Table, names: List[str]) -> None:
+    """按模型中的定义创建数据库中尚不存在的索引"""
+    existing = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in names and index.name not in existing:
+            index.create(bind=conn)
+
+
+@migration(1, "为选课记录和课程时间安排添加热点查询索引与唯一约束")
+def add_hot_query_indexes(conn: Connection) -> None:
+    # 添加唯一约束前先清理重复的选课记录，保留最早的一条
+    conn.execute(
+        text(
+            "DELETE FROM student_courses WHERE id NOT IN ("
+            "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM student_courses "
+            "GROUP BY student_id, course_id) AS keep_rows)"
+        )
+    )
+    create_missing_indexes(
+        conn,
+        models.StudentCourseModel.__table__,
+        ["uq_student_courses_student_course", "ix_student_courses_course_id"],
+    )
+    create_missing_indexes(
+        conn,
+        models.CourseScheduleModel.__table__,
+        ["ix_course_schedules_course_id", "ix_course_schedules_weekday_start_time"],
+    )
+
+
+@migration(2, "为课程添加冗余的已选人数字段")
+def add_course_enrolled_count(conn: Connection) -> None:
+    from app.utils.enrollment_counts import backfill_enrolled_counts
+
+    columns = {column["name"] for column in inspect(conn).get_columns("courses")}
+    if "enrolled_count" not in columns:
+        conn.execute(
+            text(
+                "ALTER TABLE courses ADD COLUMN enrolled_count INTEGER NOT NULL DEFAULT 0"
+            )
+        )
+    backfill_enrolled_counts(conn)
+
+
+@migration(3, "初始化课程目录版本号")
+def init_catalog_version(conn: Connection) -> None:
+    table = models.CatalogVersionModel.__table__
+    if conn.execute(select(table.c.id).where(table.c.id == 1)).first() is None:
+        conn.execute(
+            insert(table).values(
+                id=1, version=1, updated_at=datetime.datetime.now(timezone.utc)
+            )
+        )
+
+
+@migration(4, "为后台任务添加执行进程和心跳字段")
+def add_job_owner_heartbeat(conn: Connection) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("jobs")}
+    if "owner" not in columns:
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN owner VARCHAR(100)"))
+    if "heartbeat_at" not in columns:
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN heartbeat_at DATETIME"))
+
+
+@migration(5, "为课程添加关闭选课标记")
+def add_course_closed(conn: Connection) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("courses")}
+    if "closed" not in columns:
+        conn.execute(
+            text("ALTER TABLE courses ADD COLUMN closed BOOLEAN NOT NULL DEFAULT 0")
+        )
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """执行所有尚未应用的迁移，返回本次应用的版本号"""
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    newly_applied = []
+    for item in sorted(MIGRATIONS, key=lambda m: m.version):
+        if item.version in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                item.upgrade(conn)
+                conn.execute(
+                    insert(schema_migrations).values(
+                        version=item.version,
+                        description=item.description,
+                        applied_at=datetime.datetime.now(timezone.utc),
+                    )
+                )
+        except IntegrityError:
+            # 其他进程已经应用了该版本
+            continue
+        newly_applied.append(item.version)
+    return newly_applied
+
+
+# 热点查询及其应当使用的索引，语句取自 app.utils.statements，与线上执行的一致
+HOT_QUERIES = [
+    (
+        "重复选课检查",
+        statements.ENROLLMENT_EXISTS,
+        {"uq_student_courses_student_course"},
+    ),
+    (
+        "课程时间安排查询",
+        statements.COURSE_SCHEDULES,
+        {"ix_course_schedules_course_id"},
+    ),
+    (
+        "已选课程时间安排查询",
+        statements.ENROLLED_SCHEDULES,
+        {"uq_student_courses_student_course"},
+    ),
+    (
+        "分片后已选课程时间安排查询",
+        statements.SCHEDULES_OF_COURSES,
+        {"ix_course_schedules_course_id"},
+    ),
+    (
+        "时间冲突查询",
+        statements.SCHEDULE_CONFLICTS,
+        {"ix_course_schedules_course_id", "ix_course_schedules_weekday_start_time"},
+    ),
+    (
+        "选课人数统计",
+        statements.COURSE_ENROLLMENT_COUNTS,
+        {"ix_student_courses_course_id", "uq_student_courses_student_course"},
+    ),
+]
+
+# 执行计划与参数值无关；时间以字符串传入，text() 不做类型转换
+HOT_QUERY_PARAMS = {
+    "course_id": 1,
+    "course_ids": [1, 2],
+    "student_id": 1,
+    "weekday": 0,
+    "start_time": "08:00:00",
+    "end_time": "10:00:00",
+}
+
+
+def explain_prefix(conn: Connection) -> str:
+    return "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+
+
+def explain(conn: Connection, sql: str, params: dict) -> List[dict]:
+    """获取查询的执行计划"""
+    return [
+        dict(row)
+        for row in conn.execute(text(explain_prefix(conn) + sql), params).mappings()
+    ]
+
+
+def explain_statement(conn: Connection, statement, params: dict) -> List[dict]:
+    """获取 SQLAlchemy 语句的执行计划，IN 列表等参数按 params 展开"""
+    # 以命名参数编译为当前数据库的 SQL，再交给 text() 绑定参数
+    compiled = statement.compile(dialect=type(conn.dialect)(paramstyle="named"))
+    state = compiled.construct_expanded_state(
+        {name: value for name, value in params.items() if name in compiled.binds}
+    )
+    return explain(conn, state.statement, state.parameters)
+
+
+def chosen_index(row: dict) -> str:
+    """从执行计划的一行中取出实际使用的索引信息"""
+    # MySQL 的 key 列为实际选用的索引，SQLite 的 detail 列描述了查询方式
+    if "key" in row:
+        return str(row["key"] or "")
+    return str(row.get("detail", ""))
+
+
+def check_query_plans(engine: Engine) -> List[dict]:
+    """检查热点查询的执行计划是否使用了预期的索引"""
+    results = []
+    with engine.connect() as conn:
+        for name, statement, indexes in HOT_QUERIES:
+            plan = explain_statement(conn, statement, HOT_QUERY_PARAMS)
+            chosen = " ".join(chosen_index(row) for row in plan)
+            used = sorted(index for index in indexes if index in chosen)
+            results.append(
+                {"name": name, "ok": bool(used), "used_indexes": used, "plan": plan}
+            )
+    return results
+
+
+if __name__ == "__main__":
+    from app.utils.init_db import get_engine
+
+    parser = argparse.ArgumentParser(description="执行数据库迁移")
+    parser.add_argument(
+        "--explain", action="store_true", help="检查热点查询是否使用了索引"
+    )
+    args = parser.parse_args()
+
+    engine = get_engine()
+    applied = run_migrations(engine)
+    print(f"已应用迁移: {applied}" if applied else "数据库已是最新版本")
+
+    if args.explain:
+        failed = False
+        for result in check_query_plans(engine):
+            status = "通过" if result["ok"] else "未使用索引"
+            print(f"[{status}] {result['name']}")
+            for line in result["plan"]:
+                print(f"    {line}")
+            failed = failed or not result["ok"]
+        sys.exit(1 if failed else 0)
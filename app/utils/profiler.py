@@ -0,0 +1,171 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import get_settings
+from app.utils.request_context import (
+    RequestContext,
+    get_request_context,
+    reset_request_context,
+    set_request_context,
+)
+
+settings = get_settings()
+
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+|__\[POSTCOMPILE_\w+\])"
+_IN_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """请求执行的 SQL 次数超出了预算"""
+
+
+def normalize_statement(statement: str) -> str:
+    """归一化 SQL 语句形态：合并空白并折叠 IN 列表的参数"""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    return _IN_LIST.sub("(?)", statement)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profiler_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    request_context = get_request_context()
+    if request_context is None or context is None:
+        return
+    start = getattr(context, "_profiler_start", None)
+    if start is None:
+        return
+    request_context.query_count += 1
+    request_context.db_time += time.perf_counter() - start
+    if request_context.statements is not None:
+        request_context.statements[normalize_statement(statement)] += 1
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_sql_profiler() -> None:
+    """在所有引擎上注册 SQL 计数事件（只注册一次）"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _installed = True
+
+
+def repeated_statements(
+    context: RequestContext, threshold: Optional[int] = None
+) -> List[dict]:
+    """找出一次请求中重复执行次数达到阈值的语句（疑似 N+1 查询）"""
+    threshold = threshold or settings.SQL_PROFILER_REPEAT_THRESHOLD
+    if not context.statements:
+        return []
+    return [
+        {"statement": statement, "count": count}
+        for statement, count in context.statements.most_common()
+        if count >= threshold
+    ]
+
+
+class ProfileReport:
+    """最近请求的 SQL 统计滚动报告"""
+
+    def __init__(self, history: int):
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=history)
+        self.routes: Dict[str, dict] = {}
+
+    def record(self, context: RequestContext, repeated: List[dict]) -> None:
+        entry = {
+            "route": context.route_key,
+            "path": context.path,
+            "queries": context.query_count,
+            "db_time_ms": round(context.db_time * 1000, 3),
+            "repeated_statements": repeated,
+            "timestamp": time.time(),
+        }
+        with self._lock:
+            self.recent.append(entry)
+            stats = self.routes.setdefault(
+                context.route_key,
+                {
+                    "requests": 0,
+                    "total_queries": 0,
+                    "max_queries": 0,
+                    "total_db_time_ms": 0.0,
+                    "n_plus_one_requests": 0,
+                },
+            )
+            stats["requests"] += 1
+            stats["total_queries"] += context.query_count
+            stats["max_queries"] = max(stats["max_queries"], context.query_count)
+            stats["total_db_time_ms"] += entry["db_time_ms"]
+            if repeated:
+                stats["n_plus_one_requests"] += 1
+
+    def snapshot(self, limit: int = 50) -> dict:
+        with self._lock:
+            routes = {
+                route: {
+                    **stats,
+                    "avg_queries": round(stats["total_queries"] / stats["requests"], 2),
+                    "avg_db_time_ms": round(
+                        stats["total_db_time_ms"] / stats["requests"], 3
+                    ),
+                }
+                for route, stats in self.routes.items()
+            }
+            recent = list(self.recent)[-limit:]
+        return {"routes": routes, "recent": recent[::-1]}
+
+
+profile_report = ProfileReport(settings.SQL_PROFILER_HISTORY)
+
+
+def query_budget_for(context: RequestContext) -> Optional[int]:
+    return settings.SQL_PROFILER_QUERY_BUDGETS.get(context.route_key)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """限定代码块内执行的 SQL 次数，超出时抛出 QueryBudgetExceeded
+
+    用于脚本或测试中检查某段逻辑的查询次数，例如:
+
+        with query_budget(3):
+            run_lottery_allocation(db)
+
+    经过 HTTP 的请求请使用 SQL_PROFILER_QUERY_BUDGETS 和 SQL_PROFILER_STRICT。
+    """
+    install_sql_profiler()
+    context = get_request_context()
+    token = None
+    if context is None:
+        context = RequestContext("SCRIPT", "query_budget")
+        context.statements = Counter()
+        token = set_request_context(context)
+    start = context.query_count
+    try:
+        yield context
+    finally:
+        if token is not None:
+            reset_request_context(token)
+    used = context.query_count - start
+    if used > max_queries:
+        raise QueryBudgetExceeded(
+            f"执行了 {used} 条 SQL，超出预算 {max_queries} 条: "
+            f"{repeated_statements(context, 2)}"
+        )
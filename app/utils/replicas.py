@@ -0,0 +1,163 @@
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import get_settings
+from app.utils.db_pool import InstrumentedQueuePool, pool_status
+from app.utils.init_db import get_db
+
+settings = get_settings()
+
+
+class Replica:
+    """一个只读副本及其连接池"""
+
+    def __init__(self, url: str):
+        self.url = url
+        # 副本不可用时应尽快失败并改读主库，连接和等待连接池的超时都比主库短
+        connect_args = {}
+        if url.startswith("mysql"):
+            connect_args["connect_timeout"] = settings.DB_REPLICA_CONNECT_TIMEOUT
+        self.engine = create_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_REPLICA_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+            connect_args=connect_args,
+        )
+        self.session_factory = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine
+        )
+        self.healthy = True
+        self.retry_at = 0.0
+
+
+class ReplicaRouter:
+    """按轮询方式选择健康的只读副本"""
+
+    def __init__(self, urls: List[str], retry_seconds: int):
+        self.replicas = [Replica(url) for url in urls]
+        self.retry_seconds = retry_seconds
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def candidates(self) -> List[Replica]:
+        """按轮询顺序返回当前可尝试的副本"""
+        if not self.replicas:
+            return []
+        start = next(self._counter) % len(self.replicas)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        now = time.monotonic()
+        return [r for r in ordered if r.healthy or r.retry_at <= now]
+
+    def mark_down(self, replica: Replica) -> None:
+        with self._lock:
+            replica.healthy = False
+            replica.retry_at = time.monotonic() + self.retry_seconds
+
+    def mark_up(self, replica: Replica) -> None:
+        if not replica.healthy:
+            with self._lock:
+                replica.healthy = True
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "url": replica.engine.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "pool": pool_status(replica.engine),
+            }
+            for replica in self.replicas
+        ]
+
+
+_replica_router: Optional[ReplicaRouter] = None
+_replica_router_lock = threading.Lock()
+
+
+def get_replica_router() -> ReplicaRouter:
+    """获取副本路由器，首次调用时才创建副本引擎"""
+    global _replica_router
+    if _replica_router is None:
+        with _replica_router_lock:
+            if _replica_router is None:
+                _replica_router = ReplicaRouter(
+                    settings.DB_REPLICA_URLS, settings.DB_REPLICA_RETRY_SECONDS
+                )
+    return _replica_router
+
+
+# 最近写入过的客户端（按认证头区分）及其粘滞主库的截止时间
+_recent_writes: Dict[str, float] = {}
+_recent_writes_lock = threading.Lock()
+
+
+def mark_recent_write(request: Request) -> None:
+    """记录客户端刚刚完成写入，在一段时间内其读请求走主库"""
+    seconds = settings.DB_READ_YOUR_WRITES_SECONDS
+    key = request.headers.get("Authorization")
+    if seconds <= 0 or not key or not settings.DB_REPLICA_URLS:
+        return
+
+    now = time.monotonic()
+    with _recent_writes_lock:
+        if len(_recent_writes) > 10000:
+            for expired in [k for k, v in _recent_writes.items() if v <= now]:
+                del _recent_writes[expired]
+        _recent_writes[key] = now + seconds
+
+
+def is_sticky(request: Request) -> bool:
+    key = request.headers.get("Authorization")
+    if not key:
+        return False
+    deadline = _recent_writes.get(key)
+    return deadline is not None and deadline > time.monotonic()
+
+
+def open_replica_session(request: Optional[Request] = None) -> Optional[Session]:
+    """打开只读副本会话，没有可用副本或需要读己之写时返回 None"""
+    if not settings.DB_REPLICA_URLS:
+        return None
+    if request is not None and is_sticky(request):
+        return None
+
+    replica_router = get_replica_router()
+    for replica in replica_router.candidates():
+        db = replica.session_factory()
+        try:
+            # 立即获取连接，连接池的 pre-ping 即为健康检查
+            db.connection()
+        except DBAPIError:
+            db.close()
+            replica_router.mark_down(replica)
+            continue
+        except PoolTimeout:
+            # 连接池已满，副本本身可用，不标记故障
+            db.close()
+            continue
+        replica_router.mark_up(replica)
+        return db
+    return None
+
+
+def get_read_db(request: Request, primary: Session = Depends(get_db)):
+    # 没有可用副本时复用本次请求的主库会话，避免一个请求占用两个主库连接
+    db = open_replica_session(request)
+    if db is None:
+        yield primary
+        return
+    try:
+        yield db
+    finally:
+        db.close()
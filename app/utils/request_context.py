@@ -0,0 +1,70 @@
+from collections import Counter
+from contextvars import ContextVar, Token
+from typing import Optional
+
+from starlette.requests import Request
+
+
+class RequestContext:
+    """单个请求的上下文信息，供数据库事件、监控和日志使用"""
+
+    __slots__ = (
+        "method",
+        "path",
+        "route",
+        "user_id",
+        "query_count",
+        "db_time",
+        "statements",
+        "slow_queries",
+        "trace",
+    )
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.user_id: Optional[int] = None
+        self.query_count = 0
+        self.db_time = 0.0
+        self.statements: Optional[Counter] = None
+        self.slow_queries = 0
+        self.trace = None
+
+    @property
+    def route_key(self) -> str:
+        """路由标识，如 GET /api/courses/{course_id}"""
+        return f"{self.method} {self.route or self.path}"
+
+
+_current_context: ContextVar[Optional[RequestContext]] = ContextVar(
+    "request_context", default=None
+)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    return _current_context.get()
+
+
+def set_request_context(context: RequestContext) -> Token:
+    return _current_context.set(context)
+
+
+def reset_request_context(token: Token) -> None:
+    _current_context.reset(token)
+
+
+def route_template(request: Request) -> Optional[str]:
+    """获取请求匹配到的路由模板"""
+    template = getattr(request.scope.get("route"), "path", None)
+    if template is None:
+        return None
+    # 部分 FastAPI 版本中 include_router 的前缀不在 route.path 里，按实际路径补齐
+    try:
+        concrete = template.format(**request.path_params)
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = request.scope["path"]
+    if path != concrete and path.endswith(concrete):
+        template = path[: -len(concrete)] + template
+    return template
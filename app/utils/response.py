@@ -1,11 +1,13 @@
 from datetime import datetime, time
 from decimal import Decimal
-from typing import Any, Generic, Optional, TypeVar
+from typing import Any, Generic, Iterable, List, Optional, TypeVar
 
-from fastapi import status
+from fastapi import HTTPException, status
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
+from app.utils.tracing import span
+
 T = TypeVar("T")
 
 
@@ -16,39 +18,64 @@ class ResponseModel(BaseModel, Generic[T]):
 
 
 def response_success(*, data: any = None, message: str = "Success") -> JSONResponse:
-    return JSONResponse(
-        status_code=status.HTTP_200_OK,
-        content={"code": 200, "message": message, "data": data},
-    )
+    with span("response.serialize"):
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"code": 200, "message": message, "data": data},
+        )
 
 
 def response_error(*, code: int = 400, message: str = "Bad Request") -> JSONResponse:
-    return JSONResponse(
-        status_code=status.HTTP_200_OK,
-        content={"code": code, "message": message, "data": None},
-    )
+    with span("response.serialize"):
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"code": code, "message": message, "data": None},
+        )
+
+
+def serialize_value(value: Any) -> Any:
+    """将数据库中的值转换为可序列化为 JSON 的值"""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, time):
+        return value.strftime("%H:%M:%S")
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
 
 
-def model_to_dict(model: Any) -> dict:
+def model_to_dict(model: Any, fields: Optional[List[str]] = None) -> dict:
     """
     将 SQLAlchemy 模型对象转换为字典
 
     Args:
         model: SQLAlchemy 模型实例
+        fields: 只输出这些字段，默认输出全部列
 
     Returns:
         dict: 包含模型属性的字典
     """
-    result = {}
-    for column in model.__table__.columns:
-        value = getattr(model, column.name)
-        # 处理不同类型的值
-        if isinstance(value, datetime):
-            result[column.name] = value.strftime("%Y-%m-%d %H:%M:%S")
-        elif isinstance(value, time):
-            result[column.name] = value.strftime("%H:%M:%S")
-        elif isinstance(value, Decimal):
-            result[column.name] = float(value)
-        else:
-            result[column.name] = value
-    return result
+    if fields is None:
+        fields = [column.name for column in model.__table__.columns]
+    return {field: serialize_value(getattr(model, field)) for field in fields}
+
+
+def parse_fieldset(
+    value: Optional[str], allowed: Iterable[str], param: str = "fields"
+) -> Optional[List[str]]:
+    """解析逗号分隔的字段列表，未传参数时返回 None 表示不做裁剪"""
+    if value is None:
+        return None
+    allowed = list(allowed)
+    requested = []
+    for item in value.split(","):
+        item = item.strip()
+        if item and item not in requested:
+            requested.append(item)
+    unknown = [item for item in requested if item not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{param} 包含未知字段: {', '.join(unknown)}，可选: {', '.join(allowed)}",
+        )
+    return requested
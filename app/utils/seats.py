@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.utils.metrics import Gauge, registry
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SEAT_SUBSCRIBERS = registry.register(
+    Gauge("seat_stream_subscribers", "剩余名额推送的订阅连接数")
+)
+
+
+def load_remaining_seats(course_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """查询课程剩余名额，course_ids 为空时查询全部课程"""
+    from app.models import CourseModel
+    from app.utils.init_db import SessionLocal, get_engine
+
+    query = select(
+        CourseModel.id, CourseModel.max_student_num - CourseModel.enrolled_count
+    )
+    if course_ids is not None:
+        query = query.where(CourseModel.id.in_(list(course_ids)))
+    with SessionLocal(bind=get_engine()) as db:
+        return {course_id: remaining for course_id, remaining in db.execute(query)}
+
+
+class Subscriber:
+    """一个推送连接，未发送的变化按课程合并，慢连接不会堆积消息"""
+
+    def __init__(self):
+        self.pending: Dict[int, Optional[int]] = {}
+        self.ready = asyncio.Event()
+
+    def push(self, changes: Dict[int, Optional[int]]) -> None:
+        self.pending.update(changes)
+        self.ready.set()
+
+    def take(self) -> Dict[int, Optional[int]]:
+        changes, self.pending = self.pending, {}
+        self.ready.clear()
+        return changes
+
+
+class SeatBroadcaster:
+    """课程剩余名额变化的进程内广播器
+
+    选课等写操作只标记课程有变化，后台任务每个周期对变化的课程执行一次
+    查询，把结果合并推送给所有订阅者。
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._dirty: Set[int] = set()
+        self._subscribers: Set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_changed(self, course_id: int) -> None:
+        """标记课程名额有变化，可在任意线程调用"""
+        with self._lock:
+            self._dirty.add(course_id)
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber()
+        self._subscribers.add(subscriber)
+        SEAT_SUBSCRIBERS.set(len(self._subscribers))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        SEAT_SUBSCRIBERS.set(len(self._subscribers))
+
+    async def tick(self) -> None:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        if not dirty or not self._subscribers:
+            return
+        remaining = await run_in_threadpool(load_remaining_seats, dirty)
+        # 已删除的课程推送 null
+        changes = {course_id: remaining.get(course_id) for course_id in dirty}
+        for subscriber in self._subscribers:
+            subscriber.push(changes)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("推送剩余名额失败")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+seat_broadcaster = SeatBroadcaster(settings.SEAT_BROADCAST_INTERVAL)
+
+
+def sse_event(event: str, data) -> str:
+    payload = json.dumps(
+        {str(key): value for key, value in data.items()}, separators=(",", ":")
+    )
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -0,0 +1,279 @@
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    Index,
+    MetaData,
+    Table,
+    create_engine,
+    delete,
+    func,
+    insert,
+    select,
+)
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import get_settings
+from app.models import StudentCourseModel
+from app.utils.db_pool import InstrumentedQueuePool, pool_status
+from app.utils.statements import COURSE_ENROLLMENT_COUNTS
+
+settings = get_settings()
+
+student_courses = StudentCourseModel.__table__
+
+# 分片上只有 student_courses 一张表，学生和课程在主库，因此不建外键
+shard_metadata = MetaData()
+Table(
+    student_courses.name,
+    shard_metadata,
+    *[
+        Column(column.name, column.type, primary_key=column.primary_key)
+        for column in student_courses.columns
+    ],
+    *[
+        Index(index.name, *[c.name for c in index.columns], unique=index.unique)
+        for index in student_courses.indexes
+    ],
+)
+
+
+class EnrollmentShard:
+    """一个选课记录分片及其连接池"""
+
+    def __init__(self, index: int, url: str):
+        self.index = index
+        self.engine = create_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+        self.session_factory = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine
+        )
+
+
+class EnrollmentShards:
+    """按 student_id 取模把选课记录分布到多个数据库
+
+    同一学生的选课记录总在同一分片，按学生的读写只访问一个分片；按课程
+    的查询需要访问所有分片再汇总。分片数量变化后需要迁移已有数据。
+    """
+
+    def __init__(self, urls: List[str]):
+        self.shards = [EnrollmentShard(i, url) for i, url in enumerate(urls)]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.shards)
+
+    def shard_for(self, student_id: int) -> EnrollmentShard:
+        return self.shards[student_id % len(self.shards)]
+
+    def group_by_shard(
+        self, student_ids: Iterable[int]
+    ) -> Dict[EnrollmentShard, List[int]]:
+        groups = defaultdict(list)
+        for student_id in student_ids:
+            groups[self.shard_for(student_id)].append(student_id)
+        return groups
+
+    def scatter(
+        self, fn: Callable[[Session, EnrollmentShard], object], shards=None
+    ) -> list:
+        """在各分片上并行执行 fn(session, shard)，按分片顺序返回结果"""
+        shards = self.shards if shards is None else list(shards)
+
+        def run(shard: EnrollmentShard):
+            with shard.session_factory() as db:
+                return fn(db, shard)
+
+        if len(shards) <= 1:
+            return [run(shard) for shard in shards]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=len(self.shards), thread_name_prefix="shard"
+                )
+        return list(self._executor.map(run, shards))
+
+    def create_tables(self) -> None:
+        for shard in self.shards:
+            shard_metadata.create_all(shard.engine)
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "index": shard.index,
+                "url": shard.engine.url.render_as_string(hide_password=True),
+                "pool": pool_status(shard.engine),
+            }
+            for shard in self.shards
+        ]
+
+
+_enrollment_shards: Optional[EnrollmentShards] = None
+_enrollment_shards_lock = threading.Lock()
+
+
+def get_enrollment_shards() -> EnrollmentShards:
+    """获取选课记录分片，首次调用时才创建分片引擎"""
+    global _enrollment_shards
+    if _enrollment_shards is None:
+        with _enrollment_shards_lock:
+            if _enrollment_shards is None:
+                _enrollment_shards = EnrollmentShards(settings.ENROLLMENT_SHARD_URLS)
+    return _enrollment_shards
+
+
+def route_enrollments(db: Session, student_id: int) -> Session:
+    """让会话中 student_courses 的语句走该学生所在的分片，其他表仍走原来的库
+
+    会话随后只能读写这一名学生的选课记录；提交时各个库依次提交，跨库的
+    已选人数偏差由 enrollment_counts 核对修复。
+    """
+    shards = get_enrollment_shards()
+    if shards.enabled:
+        engine = shards.shard_for(student_id).engine
+        db.bind_mapper(StudentCourseModel, engine)
+        db.bind_table(student_courses, engine)
+    return db
+
+
+def enrollments_for_students(
+    db: Session, student_ids: List[int]
+) -> List[Tuple[int, int]]:
+    """一批学生的 (student_id, course_id)，按学生和选课顺序排列"""
+    if not student_ids:
+        return []
+
+    def query(session: Session, ids: List[int]) -> list:
+        return session.execute(
+            select(student_courses.c.student_id, student_courses.c.course_id)
+            .where(student_courses.c.student_id.in_(ids))
+            .order_by(student_courses.c.student_id, student_courses.c.id)
+        ).all()
+
+    shards = get_enrollment_shards()
+    if not shards.enabled:
+        return query(db, student_ids)
+    groups = shards.group_by_shard(student_ids)
+    results = shards.scatter(
+        lambda session, shard: query(session, groups[shard]), groups
+    )
+    return sorted((tuple(row) for rows in results for row in rows), key=lambda r: r[0])
+
+
+def all_enrollments(db: Session) -> List[Tuple[int, int]]:
+    """全部选课记录的 (student_id, course_id)"""
+    statement = select(student_courses.c.student_id, student_courses.c.course_id)
+    shards = get_enrollment_shards()
+    if not shards.enabled:
+        return db.execute(statement).all()
+    results = shards.scatter(lambda session, shard: session.execute(statement).all())
+    return [row for rows in results for row in rows]
+
+
+def insert_enrollments(db: Session, rows: List[dict], batch_size: int) -> None:
+    """批量写入选课记录
+
+    未分片时在 db 的事务中写入；分片时各分片分别提交，调用方随后再提交
+    主库中的已选人数。
+    """
+    shards = get_enrollment_shards()
+    if not shards.enabled:
+        for i in range(0, len(rows), batch_size):
+            db.execute(insert(student_courses), rows[i : i + batch_size])
+        return
+
+    groups = defaultdict(list)
+    for row in rows:
+        groups[shards.shard_for(row["student_id"])].append(row)
+
+    def write(session: Session, shard: EnrollmentShard) -> None:
+        shard_rows = groups[shard]
+        for i in range(0, len(shard_rows), batch_size):
+            session.execute(insert(student_courses), shard_rows[i : i + batch_size])
+        session.commit()
+
+    shards.scatter(write, groups)
+
+
+def course_enrollment_counts(
+    db: Session, course_ids: Optional[List[int]] = None
+) -> Counter:
+    """各课程的选课记录数，分片时汇总所有分片的结果"""
+
+    def query(session: Session, shard=None) -> list:
+        if course_ids is not None:
+            return session.execute(
+                COURSE_ENROLLMENT_COUNTS, {"course_ids": course_ids}
+            ).all()
+        return session.execute(
+            select(student_courses.c.course_id, func.count()).group_by(
+                student_courses.c.course_id
+            )
+        ).all()
+
+    shards = get_enrollment_shards()
+    results = shards.scatter(query) if shards.enabled else [query(db)]
+    counts = Counter()
+    for rows in results:
+        for course_id, count in rows:
+            counts[course_id] += count
+    return counts
+
+
+def delete_course_enrollments(
+    db: Session, course_id: int, limit: Optional[int] = None
+) -> List[int]:
+    """删除课程的选课记录，返回被退课的学生 ID
+
+    limit 限制每个库本次删除的条数，供分批删除使用。未分片时在 db 的事务中
+    删除；分片时各分片分别提交，应在删除课程之前调用。
+    """
+    condition = student_courses.c.course_id == course_id
+
+    def remove(session: Session) -> List[int]:
+        if limit is None:
+            student_ids = list(
+                session.scalars(select(student_courses.c.student_id).where(condition))
+            )
+            session.execute(delete(student_courses).where(condition))
+            return student_ids
+        rows = session.execute(
+            select(student_courses.c.id, student_courses.c.student_id)
+            .where(condition)
+            .limit(limit)
+        ).all()
+        if rows:
+            session.execute(
+                delete(student_courses).where(
+                    student_courses.c.id.in_([row.id for row in rows])
+                )
+            )
+        return [row.student_id for row in rows]
+
+    shards = get_enrollment_shards()
+    if not shards.enabled:
+        return remove(db)
+
+    def remove_and_commit(session: Session, shard: EnrollmentShard) -> List[int]:
+        student_ids = remove(session)
+        session.commit()
+        return student_ids
+
+    return sorted(
+        student_id
+        for student_ids in shards.scatter(remove_and_commit)
+        for student_id in student_ids
+    )
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from app.utils.metrics import Counter, registry
+
+SINGLE_FLIGHT_REQUESTS = registry.register(
+    Counter(
+        "single_flight_requests",
+        "合并的 GET 请求，leader 实际执行，follower 复用其响应",
+        ("route", "role"),
+    )
+)
+
+
+def coalescing_key(scope) -> tuple:
+    """路径加排序后的查询参数，参数顺序不同的请求视为相同"""
+    query = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+    authorization = dict(scope["headers"]).get(b"authorization", b"")
+    # 开启合并的路由只要求携带令牌，响应与具体用户无关
+    return (
+        scope["path"],
+        urlencode(sorted(query)),
+        authorization.lower().startswith(b"bearer "),
+    )
+
+
+class SingleFlightMiddleware:
+    """合并并发的相同 GET 请求
+
+    同一个 key 只有第一个请求（leader）执行路由，执行期间到达的相同请求
+    等待并直接复用 leader 已序列化的响应。leader 失败时其余请求各自执行。
+    只缓存执行中的请求，响应完成后不保留。
+    """
+
+    def __init__(self, app, paths: Iterable[str]):
+        self.app = app
+        self.paths = frozenset(paths)
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = coalescing_key(scope)
+        leader = self._inflight.get(key)
+        if leader is not None:
+            # shield 避免 follower 断开时取消共享的 future
+            messages = await asyncio.shield(leader)
+            if messages is not None:
+                SINGLE_FLIGHT_REQUESTS.inc(route=scope["path"], role="follower")
+                await self._replay(messages, send)
+                return
+            await self.app(scope, receive, send)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        SINGLE_FLIGHT_REQUESTS.inc(route=scope["path"], role="leader")
+        messages: List[dict] = []
+
+        async def capture(message):
+            messages.append(message)
+
+        result: Optional[List[dict]] = None
+        try:
+            await self.app(scope, receive, capture)
+            result = messages
+        finally:
+            del self._inflight[key]
+            future.set_result(result)
+        await self._replay(messages, send)
+
+    @staticmethod
+    async def _replay(messages: List[dict], send) -> None:
+        for message in messages:
+            # 外层中间件会原地修改响应头，每个请求使用独立的副本
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message["headers"])}
+            await send(message)
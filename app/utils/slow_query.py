@@ -0,0 +1,168 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import get_settings
+from app.utils.metrics import Counter, registry
+from app.utils.request_context import RequestContext, get_request_context
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES = registry.register(
+    Counter("db_slow_queries", "超过慢查询阈值的 SQL 次数", ("route",))
+)
+
+# 参数可能很长（如批量写入），记录时截断
+MAX_PARAMETERS_LENGTH = 1000
+
+
+class SlowQueryLog:
+    """慢查询环形缓冲区，执行计划由后台线程补充，不占用请求的数据库连接"""
+
+    def __init__(self, size: int, explain_queue_size: int = 100):
+        self._lock = threading.Lock()
+        self.entries = deque(maxlen=size)
+        self._explain_queue = queue.Queue(maxsize=explain_queue_size)
+        self._worker: Optional[threading.Thread] = None
+
+    def record(
+        self,
+        engine: Engine,
+        statement: str,
+        parameters,
+        elapsed: float,
+        context: Optional[RequestContext],
+    ) -> dict:
+        is_select = statement.lstrip()[:6].upper() == "SELECT"
+        entry = {
+            "statement": statement,
+            # 写入语句的参数可能含密码哈希等敏感数据，只保留查询语句的参数
+            "parameters": (
+                repr(parameters)[:MAX_PARAMETERS_LENGTH] if is_select else None
+            ),
+            "duration_ms": round(elapsed * 1000, 3),
+            "timestamp": time.time(),
+            "plan": None,
+            # 路由在请求结束后才能确定，查看时再读取
+            "_context": context,
+        }
+        with self._lock:
+            self.entries.append(entry)
+        if context is None:
+            SLOW_QUERIES.inc(route="none")
+        else:
+            # 请求结束后按路由模板计数，见 record_request_slow_queries
+            context.slow_queries += 1
+        logger.warning(
+            "慢查询",
+            extra={
+                "duration_ms": entry["duration_ms"],
+                "statement": " ".join(statement.split())[:200],
+            },
+        )
+
+        if settings.SLOW_QUERY_EXPLAIN and is_select:
+            self._start_worker()
+            try:
+                self._explain_queue.put_nowait((engine, entry, statement, parameters))
+            except queue.Full:
+                entry["plan_error"] = "执行计划队列已满，未采集"
+        return entry
+
+    def _start_worker(self) -> None:
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._explain_loop,
+                        name="slow-query-explain",
+                        daemon=True,
+                    )
+                    self._worker.start()
+
+    def _explain_loop(self) -> None:
+        from app.utils.migrations import explain_prefix
+
+        while True:
+            engine, entry, statement, parameters = self._explain_queue.get()
+            try:
+                with engine.connect() as conn:
+                    result = conn.exec_driver_sql(
+                        explain_prefix(conn) + statement, parameters
+                    )
+                    entry["plan"] = [dict(row) for row in result.mappings()]
+            except Exception as e:
+                entry["plan_error"] = str(e)
+
+    def snapshot(self, limit: int = 50) -> List[dict]:
+        with self._lock:
+            entries = list(self.entries)[-limit:]
+        result = []
+        for entry in reversed(entries):
+            item = {k: v for k, v in entry.items() if k != "_context"}
+            context = entry["_context"]
+            item["route"] = context.route_key if context else None
+            result.append(item)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+
+
+def record_request_slow_queries(context: RequestContext) -> None:
+    """请求结束、路由已确定后累计慢查询次数，未匹配的路径归为 unmatched"""
+    if context.slow_queries:
+        route = f"{context.method} {context.route}" if context.route else "unmatched"
+        SLOW_QUERIES.inc(context.slow_queries, route=route)
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_LOG_SIZE)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._slow_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_slow_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    if elapsed * 1000 < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+    # 避免采集执行计划本身又被记为慢查询
+    if statement.lstrip()[:7].upper() == "EXPLAIN":
+        return
+    slow_query_log.record(
+        conn.engine,
+        statement,
+        parameters,
+        elapsed,
+        get_request_context(),
+    )
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_slow_query_log() -> None:
+    """在所有引擎上注册慢查询检测事件，阈值不大于 0 时不启用"""
+    global _installed
+    if settings.SLOW_QUERY_THRESHOLD_MS <= 0:
+        return
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _installed = True
@@ -0,0 +1,118 @@
+from sqlalchemy import bindparam, func, insert, select, update
+
+from app.models import (
+    ArchivedStudentCourseModel,
+    CourseModel,
+    CourseScheduleModel,
+    StudentCourseModel,
+    StudentModel,
+)
+
+# 热点路径的语句在导入时构建一次，参数全部通过 bindparam 传入。执行时不再
+# 重新构建 Query 对象，缓存键稳定，编译结果由引擎的编译缓存复用。
+
+# 认证：按用户名加载当前用户
+USER_BY_USERNAME = select(StudentModel).where(
+    StudentModel.username == bindparam("username")
+)
+
+# 选课：课程名额信息
+COURSE_SEATS = select(
+    CourseModel.id,
+    CourseModel.enrolled_count,
+    CourseModel.max_student_num,
+    CourseModel.closed,
+).where(CourseModel.id == bindparam("course_id"))
+
+# 选课：是否已选该课程
+ENROLLMENT_EXISTS = (
+    select(StudentCourseModel.id)
+    .where(
+        StudentCourseModel.student_id == bindparam("student_id"),
+        StudentCourseModel.course_id == bindparam("course_id"),
+    )
+    .limit(1)
+)
+
+# 选课：待选课程的时间安排
+COURSE_SCHEDULES = select(
+    CourseScheduleModel.weekday,
+    CourseScheduleModel.start_time,
+    CourseScheduleModel.end_time,
+).where(CourseScheduleModel.course_id == bindparam("course_id"))
+
+# 选课：学生已选课程的时间安排，一次查询代替先查课程 ID 再查时间
+ENROLLED_SCHEDULES = (
+    select(
+        CourseScheduleModel.weekday,
+        CourseScheduleModel.start_time,
+        CourseScheduleModel.end_time,
+        CourseModel.name,
+    )
+    .join(
+        StudentCourseModel,
+        StudentCourseModel.course_id == CourseScheduleModel.course_id,
+    )
+    .join(CourseModel, CourseModel.id == CourseScheduleModel.course_id)
+    .where(StudentCourseModel.student_id == bindparam("student_id"))
+)
+
+# 选课：指定课程的时间安排，选课记录分片后代替上面的跨表连接
+SCHEDULES_OF_COURSES = (
+    select(
+        CourseScheduleModel.weekday,
+        CourseScheduleModel.start_time,
+        CourseScheduleModel.end_time,
+        CourseModel.name,
+    )
+    .join(CourseModel, CourseModel.id == CourseScheduleModel.course_id)
+    .where(CourseScheduleModel.course_id.in_(bindparam("course_ids", expanding=True)))
+)
+
+# 时间冲突：指定课程中与给定时间段重叠的时间安排
+SCHEDULE_CONFLICTS = (
+    select(
+        CourseScheduleModel.start_time,
+        CourseScheduleModel.end_time,
+        CourseModel.name,
+    )
+    .join(CourseModel, CourseModel.id == CourseScheduleModel.course_id)
+    .where(
+        CourseScheduleModel.course_id.in_(bindparam("course_ids", expanding=True)),
+        CourseScheduleModel.weekday == bindparam("weekday"),
+        CourseScheduleModel.start_time < bindparam("end_time"),
+        CourseScheduleModel.end_time > bindparam("start_time"),
+    )
+)
+
+# 选课人数：指定课程的选课记录数
+COURSE_ENROLLMENT_COUNTS = (
+    select(StudentCourseModel.course_id, func.count())
+    .where(StudentCourseModel.course_id.in_(bindparam("course_ids", expanding=True)))
+    .group_by(StudentCourseModel.course_id)
+)
+
+# 选课：课程未关闭且已选人数未达上限时才加一
+RESERVE_SEAT = (
+    update(CourseModel)
+    .where(
+        CourseModel.id == bindparam("course_id"),
+        CourseModel.closed.is_(False),
+        CourseModel.enrolled_count < CourseModel.max_student_num,
+    )
+    .values(enrolled_count=CourseModel.enrolled_count + 1)
+    .execution_options(synchronize_session=False)
+)
+
+# 选课：写入选课记录
+INSERT_ENROLLMENT = insert(StudentCourseModel.__table__)
+
+# 课程表：学生已选课程的 ID
+ENROLLED_COURSE_IDS = select(StudentCourseModel.course_id).where(
+    StudentCourseModel.student_id == bindparam("student_id")
+)
+
+# 课程表：学生在已归档学期所选课程的 ID
+ARCHIVED_ENROLLED_COURSE_IDS = select(ArchivedStudentCourseModel.course_id).where(
+    ArchivedStudentCourseModel.student_id == bindparam("student_id")
+)
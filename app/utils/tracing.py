@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import get_settings
+from app.utils.request_context import RequestContext, get_request_context
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "student-course-service"
+# OTLP 中的 span 类型
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+
+class Span:
+    """一个计时片段，时间使用 Unix 纳秒"""
+
+    __slots__ = (
+        "name",
+        "span_id",
+        "parent_id",
+        "kind",
+        "start_ns",
+        "end_ns",
+        "attributes",
+    )
+
+    def __init__(
+        self, name: str, parent_id: Optional[str], kind: int, attributes: dict
+    ):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns or time.time_ns()
+        return round((end_ns - self.start_ns) / 1e6, 3)
+
+
+class Trace:
+    """一次请求的所有 span，第一个 span 为请求本身"""
+
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+
+    def start_span(
+        self,
+        name: str,
+        parent: Optional[Span] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        **attributes,
+    ) -> Span:
+        span = Span(name, parent.span_id if parent else None, kind, attributes)
+        # list.append 是线程安全的，请求中的依赖可能在不同线程中执行
+        self.spans.append(span)
+        return span
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def to_tree(self) -> dict:
+        """转换为嵌套的 span 树，便于查看"""
+        nodes = {
+            span.span_id: {
+                "name": span.name,
+                "duration_ms": span.duration_ms,
+                "offset_ms": round((span.start_ns - self.root.start_ns) / 1e6, 3),
+                "attributes": span.attributes,
+                "children": [],
+            }
+            for span in self.spans
+        }
+        for span in self.spans[1:]:
+            parent = nodes.get(span.parent_id, nodes[self.root.span_id])
+            parent["children"].append(nodes[span.span_id])
+        return nodes[self.root.span_id]
+
+    def to_otlp(self) -> dict:
+        """转换为 OTLP/JSON 格式的 ResourceSpans"""
+
+        def attribute(key, value):
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        spans = []
+        for span in self.spans:
+            item = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": span.kind,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or self.root.end_ns),
+                "attributes": [attribute(k, v) for k, v in span.attributes.items()],
+            }
+            if span.parent_id:
+                item["parentSpanId"] = span.parent_id
+            spans.append(item)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [attribute("service.name", SERVICE_NAME)]
+                    },
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+                }
+            ]
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def should_sample() -> bool:
+    rate = settings.TRACING_SAMPLE_RATE
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+def current_trace() -> Optional[Trace]:
+    context = get_request_context()
+    return context.trace if context is not None else None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """在当前请求的 trace 中记录一个 span，请求未被采样时不做任何事"""
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+    item = trace.start_span(name, _current_span.get(), **attributes)
+    token = _current_span.set(item)
+    try:
+        yield item
+    finally:
+        item.end()
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace_request(context: RequestContext, name: str):
+    """为采样到的请求创建 trace 及其根 span"""
+    if not should_sample():
+        yield None
+        return
+    context.trace = Trace()
+    root = context.trace.start_span(name, kind=SPAN_KIND_SERVER)
+    token = _current_span.set(root)
+    try:
+        yield root
+    finally:
+        root.end()
+        _current_span.reset(token)
+
+
+class TraceExporter:
+    """保存最近的 trace，并可选地以 OTLP/JSON Lines 格式写入本地文件"""
+
+    def __init__(self, size: int, path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self.traces = deque(maxlen=size)
+        self.path = path
+        self._file_queue = queue.Queue(maxsize=1000)
+        self._writer: Optional[threading.Thread] = None
+
+    def export(self, trace: Trace) -> None:
+        with self._lock:
+            self.traces.append(trace)
+        if self.path:
+            self._start_writer()
+            try:
+                self._file_queue.put_nowait(trace)
+            except queue.Full:
+                pass
+
+    def _start_writer(self) -> None:
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(
+                        target=self._write_loop, name="trace-writer", daemon=True
+                    )
+                    self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            trace = self._file_queue.get()
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace.to_otlp(), ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.error(f"写入 trace 文件失败: {e}")
+
+    def slowest(self, limit: int = 10) -> List[Trace]:
+        with self._lock:
+            traces = list(self.traces)
+        return sorted(traces, key=lambda t: t.root.duration_ms, reverse=True)[:limit]
+
+    def find(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return next((t for t in self.traces if t.trace_id == trace_id), None)
+
+
+trace_exporter = TraceExporter(settings.TRACING_BUFFER_SIZE, settings.TRACING_FILE)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace()
+    if trace is None or context is None:
+        return
+    context._trace_span = trace.start_span(
+        "db.query",
+        _current_span.get(),
+        SPAN_KIND_CLIENT,
+        **{"db.system": conn.dialect.name, "db.statement": statement[:500]},
+    )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    item = getattr(context, "_trace_span", None)
+    if item is not None:
+        item.end()
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_tracing() -> None:
+    """在所有引擎上注册 SQL span 事件，采样率为 0 时不启用"""
+    global _installed
+    if settings.TRACING_SAMPLE_RATE <= 0:
+        return
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _installed = True
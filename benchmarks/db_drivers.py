@@ -0,0 +1,132 @@
+"""MySQL 驱动大结果集读取基准
+
+使用 .env 中的 MySQL 配置，依次通过各个驱动读取 list_students 返回的
+全部学生，分别测量 Core 行读取和 ORM 实体加载加序列化的耗时。未安装的
+驱动会被跳过。测试前需先用 app.utils.generate_dataset 写入模拟数据。
+
+用法: python -m benchmarks.db_drivers \\
+          [--drivers mysqlconnector,pymysql,mysqldb,aiomysql] [--runs 5]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.config import get_settings
+from app.models import StudentModel
+from app.utils.init_db import ASYNC_MYSQL_DRIVERS, MYSQL_DRIVERS, mysql_url
+from app.utils.response import model_to_dict
+
+settings = get_settings()
+
+# 与 list_students 未带筛选条件时的查询一致
+STUDENTS = select(StudentModel).where(StudentModel.username != "admin")
+STUDENT_ROWS = select(*StudentModel.__table__.columns).where(
+    StudentModel.username != "admin"
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="MySQL 驱动大结果集读取基准")
+    parser.add_argument(
+        "--drivers",
+        default=",".join([*MYSQL_DRIVERS, *ASYNC_MYSQL_DRIVERS]),
+        help="逗号分隔的驱动列表",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="每项测试的重复次数")
+    return parser.parse_args()
+
+
+def timings_report(timings: list, rows: int) -> dict:
+    best = min(timings)
+    return {
+        "rows": rows,
+        "min_ms": round(best * 1000, 1),
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "rows_per_second": round(rows / best) if best > 0 else None,
+    }
+
+
+def measure(fetch, runs: int) -> dict:
+    rows = fetch()  # 预热
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fetch()
+        timings.append(time.perf_counter() - start)
+    return timings_report(timings, rows)
+
+
+def bench_sync(driver: str, runs: int) -> dict:
+    engine = create_engine(mysql_url(driver, settings.DB_NAME), poolclass=NullPool)
+    try:
+
+        def fetch_rows():
+            with engine.connect() as conn:
+                return len(conn.execute(STUDENT_ROWS).all())
+
+        def load_students():
+            with Session(engine) as db:
+                return len([model_to_dict(s) for s in db.scalars(STUDENTS)])
+
+        return {
+            "core_rows": measure(fetch_rows, runs),
+            "orm_serialize": measure(load_students, runs),
+        }
+    finally:
+        engine.dispose()
+
+
+async def measure_async(fetch, runs: int) -> dict:
+    rows = await fetch()  # 预热
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await fetch()
+        timings.append(time.perf_counter() - start)
+    return timings_report(timings, rows)
+
+
+async def bench_async(driver: str, runs: int) -> dict:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    engine = create_async_engine(
+        mysql_url(driver, settings.DB_NAME), poolclass=NullPool
+    )
+    try:
+
+        async def fetch_rows():
+            async with engine.connect() as conn:
+                return len((await conn.execute(STUDENT_ROWS)).all())
+
+        async def load_students():
+            async with AsyncSession(engine) as db:
+                students = await db.scalars(STUDENTS)
+                return len([model_to_dict(s) for s in students])
+
+        return {
+            "core_rows": await measure_async(fetch_rows, runs),
+            "orm_serialize": await measure_async(load_students, runs),
+        }
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = {}
+    for driver in args.drivers.split(","):
+        try:
+            if driver in ASYNC_MYSQL_DRIVERS:
+                results[driver] = asyncio.run(bench_async(driver, args.runs))
+            else:
+                results[driver] = bench_sync(driver, args.runs)
+        except ImportError as e:
+            results[driver] = {"skipped": f"驱动未安装: {e}"}
+    print(json.dumps(results, ensure_ascii=False, indent=2))
@@ -0,0 +1,203 @@
+"""选课热点路径语句构建开销的微基准
+
+在内存 SQLite 中重复执行一次完整的选课尝试（课程查询、重复检查、
+时间冲突检查、占用名额、写入记录，最后回滚），分别使用逐次构建的
+ORM Query 和 app.utils.statements 中的预构建语句，对比每次尝试的总耗时
+以及扣除驱动执行时间后的 Python 侧耗时。
+
+用法: python -m benchmarks.enroll_statements [--attempts 5000] [--courses 200]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import time
+
+# 必须在导入 app 之前设置，配置在首次读取后会被缓存
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from sqlalchemy import create_engine, event, insert, update  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.models import (  # noqa: E402
+    CourseModel,
+    CourseScheduleModel,
+    StudentCourseModel,
+    StudentModel,
+)
+from app.utils import statements  # noqa: E402
+from app.utils.init_db import Base  # noqa: E402
+from benchmarks.stats import summarize  # noqa: E402
+
+STUDENT_ID = 1
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="选课语句构建开销微基准")
+    parser.add_argument("--attempts", type=int, default=5000, help="每种实现的尝试次数")
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--enrolled", type=int, default=8, help="学生已选课程数")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def build_database(args):
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(engine)
+    rng = random.Random(args.seed)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(StudentModel),
+            [{"id": STUDENT_ID, "username": "student000001"}],
+        )
+        conn.execute(
+            insert(CourseModel),
+            [
+                {
+                    "id": i,
+                    "code": f"C{i:05d}",
+                    "name": f"课程{i}",
+                    "teacher": "教师",
+                    "credits": 2,
+                    "max_student_num": 1000000,
+                }
+                for i in range(1, args.courses + 1)
+            ],
+        )
+        conn.execute(
+            insert(CourseScheduleModel),
+            [
+                {
+                    "course_id": i,
+                    "weekday": rng.randrange(5),
+                    "start_time": datetime.time(8 + 2 * rng.randrange(6)),
+                    "end_time": datetime.time(9 + 2 * rng.randrange(6), 40),
+                }
+                for i in range(1, args.courses + 1)
+            ],
+        )
+        conn.execute(
+            insert(StudentCourseModel),
+            [
+                {"student_id": STUDENT_ID, "course_id": i}
+                for i in range(1, args.enrolled + 1)
+            ],
+        )
+    return engine
+
+
+def orm_attempt(db: Session, student_id: int, course_id: int) -> None:
+    """原实现：每次构建新的 ORM Query"""
+    course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
+    db.query(StudentCourseModel).filter(
+        StudentCourseModel.student_id == student_id,
+        StudentCourseModel.course_id == course_id,
+    ).first()
+    course_schedules = (
+        db.query(CourseScheduleModel)
+        .filter(CourseScheduleModel.course_id == course_id)
+        .all()
+    )
+    if course_schedules:
+        enrolled_courses = (
+            db.query(StudentCourseModel)
+            .filter(StudentCourseModel.student_id == student_id)
+            .all()
+        )
+        enrolled_course_ids = [ec.course_id for ec in enrolled_courses]
+        db.query(CourseScheduleModel, CourseModel).join(CourseModel).filter(
+            CourseScheduleModel.course_id.in_(enrolled_course_ids)
+        ).all()
+    db.execute(
+        update(CourseModel)
+        .where(
+            CourseModel.id == course.id,
+            CourseModel.enrolled_count < CourseModel.max_student_num,
+        )
+        .values(enrolled_count=CourseModel.enrolled_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.add(StudentCourseModel(student_id=student_id, course_id=course_id))
+    db.flush()
+
+
+def prebuilt_attempt(db: Session, student_id: int, course_id: int) -> None:
+    """现实现：执行预构建语句"""
+    params = {"student_id": student_id, "course_id": course_id}
+    db.execute(statements.COURSE_SEATS, params).first()
+    db.execute(statements.ENROLLMENT_EXISTS, params).first()
+    if db.execute(statements.COURSE_SCHEDULES, params).all():
+        db.execute(statements.ENROLLED_SCHEDULES, params).all()
+    db.execute(statements.RESERVE_SEAT, params)
+    db.execute(statements.INSERT_ENROLLMENT, params)
+
+
+def measure(engine, attempt, args) -> dict:
+    """返回每次尝试的总耗时和扣除驱动执行时间后的 Python 侧耗时"""
+    driver_time = 0.0
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["bench_start"] = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        nonlocal driver_time
+        driver_time += time.perf_counter() - conn.info.pop("bench_start")
+
+    rng = random.Random(args.seed)
+    course_ids = [
+        rng.randint(args.enrolled + 1, args.courses) for _ in range(args.attempts)
+    ]
+    # 预热：填充编译缓存
+    with Session(engine) as db:
+        for course_id in course_ids[:100]:
+            attempt(db, STUDENT_ID, course_id)
+            db.rollback()
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    totals, python_side = [], []
+    try:
+        with Session(engine) as db:
+            for course_id in course_ids:
+                driver_before = driver_time
+                start = time.perf_counter()
+                attempt(db, STUDENT_ID, course_id)
+                db.rollback()
+                elapsed = time.perf_counter() - start
+                totals.append(elapsed)
+                python_side.append(elapsed - (driver_time - driver_before))
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+        event.remove(engine, "after_cursor_execute", after)
+
+    elapsed = sum(totals)
+    return {
+        "total": summarize(totals, elapsed),
+        "python_side": summarize(python_side, elapsed),
+        "python_side_share": round(sum(python_side) / elapsed, 3),
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    engine = build_database(args)
+    report = {
+        "config": vars(args),
+        "orm_query": measure(engine, orm_attempt, args),
+        "prebuilt": measure(engine, prebuilt_attempt, args),
+    }
+    before_us = report["orm_query"]["python_side"]["mean_ms"] * 1000
+    after_us = report["prebuilt"]["python_side"]["mean_ms"] * 1000
+    report["python_side_mean_us"] = {
+        "orm_query": round(before_us, 1),
+        "prebuilt": round(after_us, 1),
+        "speedup": round(before_us / after_us, 2) if after_us else None,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,83 @@
+"""导入耗时基准测试
+
+在独立的子进程中多次导入指定模块，统计导入耗时，并借助
+``python -X importtime`` 列出累计耗时最高的模块。
+
+用法: python -m benchmarks.import_time [--module app.main] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TIMER_CODE = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def run_python(args: list) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [PROJECT_ROOT, env.get("PYTHONPATH")])
+    )
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def measure_import(module: str, runs: int) -> list:
+    """在新进程中导入模块，返回每次的耗时（秒）"""
+    timings = []
+    for _ in range(runs):
+        result = run_python(["-c", TIMER_CODE.format(module=module)])
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def slowest_modules(module: str, top: int) -> list:
+    """解析 -X importtime 的输出，返回累计耗时最高的模块"""
+    result = run_python(["-X", "importtime", "-c", f"import {module}"])
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        entries.append(
+            {
+                "module": name.strip(),
+                "self_ms": int(self_us.strip()) / 1000,
+                "cumulative_ms": int(cumulative_us.strip()) / 1000,
+            }
+        )
+    entries.sort(key=lambda entry: entry["cumulative_ms"], reverse=True)
+    return entries[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="导入耗时基准测试")
+    parser.add_argument("--module", default="app.main", help="要导入的模块")
+    parser.add_argument("--runs", type=int, default=5, help="重复次数")
+    parser.add_argument("--top", type=int, default=15, help="列出最慢的模块数量")
+    args = parser.parse_args()
+
+    timings = measure_import(args.module, args.runs)
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "min_ms": round(min(timings) * 1000, 2),
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "max_ms": round(max(timings) * 1000, 2),
+        "slowest_modules": slowest_modules(args.module, args.top),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,218 @@
+"""选课周负载模拟
+
+通过 ASGI 客户端在进程内驱动真实的 FastAPI 应用，对本地数据库
+（默认 SQLite 文件）执行脚本化场景，按路由输出吞吐量与 p50/p95/p99。
+
+用法: python -m benchmarks.load_test --scale 0.02 --requests 2000 \\
+          --concurrency 50 --output result.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import random
+import time
+from collections import defaultdict
+
+from benchmarks.stats import summarize
+
+SCENARIOS = ["login", "enroll", "browse", "timetable"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="选课周负载模拟")
+    parser.add_argument(
+        "--database-url",
+        default="sqlite:///./loadtest.db",
+        help="测试使用的数据库，会被清空重建",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=0.02,
+        help="数据规模系数，1.0 对应 10 万学生、5000 门课程",
+    )
+    parser.add_argument(
+        "--enrollments-per-student",
+        type=float,
+        default=0,
+        help="预先写入的平均选课数，默认 0 表示选课刚开始",
+    )
+    parser.add_argument("--requests", type=int, default=2000, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景列表"
+    )
+    parser.add_argument("--output", help="结果 JSON 输出文件，默认打印到标准输出")
+    return parser.parse_args()
+
+
+def md5(value: str) -> str:
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def reset_database(args) -> None:
+    """清空并重建测试数据库，使用数据生成器写入模拟数据"""
+    from app.utils.generate_dataset import load_dataset
+    from app.utils.generate_dataset import parse_args as dataset_args
+    from app.utils.generate_dataset import reset_schema
+    from app.utils.init_db import get_engine
+
+    engine = get_engine()
+    reset_schema(engine)
+    load_dataset(
+        engine,
+        dataset_args(
+            [
+                "--scale",
+                str(args.scale),
+                "--enrollments-per-student",
+                str(args.enrollments_per_student),
+                "--seed",
+                str(args.seed),
+            ]
+        ),
+    )
+
+
+class Recorder:
+    """按路由记录请求耗时、HTTP 错误和业务返回码"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.http_errors = defaultdict(int)
+        self.codes = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, client, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[label].append(time.perf_counter() - start)
+        if response.status_code != 200:
+            self.http_errors[label] += 1
+        else:
+            self.codes[label][str(response.json().get("code"))] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        return {
+            label: {
+                **summarize(latencies, elapsed),
+                "http_errors": self.http_errors[label],
+                "codes": dict(self.codes[label]),
+            }
+            for label, latencies in self.latencies.items()
+        }
+
+
+async def run_workers(total: int, concurrency: int, make_request) -> float:
+    """以固定并发执行 total 个请求，返回总耗时"""
+    counter = iter(range(total))
+
+    async def worker():
+        for index in counter:
+            await make_request(index)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from app.main import app
+    from app.utils.auth import create_access_token
+    from app.utils.generate_dataset import parse_args as dataset_args
+
+    dataset = dataset_args(["--scale", str(args.scale)])
+    rng = random.Random(args.seed)
+    students = range(1, dataset.students + 1)
+    tokens = {
+        i: create_access_token(
+            {"sub": f"student{i:06d}"}, expires_delta=datetime.timedelta(hours=2)
+        )
+        for i in students
+    }
+    # 热门课程更受欢迎：按排名的倒数加权
+    course_ids = list(range(1, dataset.courses + 1))
+    course_weights = [1 / rank for rank in course_ids]
+
+    def auth(student_id: int) -> dict:
+        return {"Authorization": f"Bearer {tokens[student_id]}"}
+
+    scenarios = {
+        "login": lambda r, c, i: r.request(
+            c,
+            "POST /api/login",
+            "POST",
+            "/api/login",
+            json={
+                "username": f"student{rng.choice(students):06d}",
+                "password": md5("123456"),
+            },
+        ),
+        "enroll": lambda r, c, i: r.request(
+            c,
+            "POST /api/courses/{course_id}/enroll",
+            "POST",
+            f"/api/courses/{rng.choices(course_ids, course_weights)[0]}/enroll",
+            headers=auth(rng.choice(students)),
+        ),
+        "browse": lambda r, c, i: r.request(
+            c,
+            "GET /api/courses/my-selection",
+            "GET",
+            "/api/courses/my-selection",
+            headers=auth(rng.choice(students)),
+        ),
+        "timetable": lambda r, c, i: r.request(
+            c,
+            "GET /api/schedules/my",
+            "GET",
+            "/api/schedules/my",
+            headers=auth(rng.choice(students)),
+        ),
+    }
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadtest"
+        ) as client:
+            for name in args.scenarios.split(","):
+                recorder = Recorder()
+                scenario = scenarios[name]
+                elapsed = await run_workers(
+                    args.requests,
+                    args.concurrency,
+                    lambda i: scenario(recorder, client, i),
+                )
+                results[name] = {
+                    "elapsed_s": round(elapsed, 3),
+                    "routes": recorder.report(elapsed),
+                }
+    return results
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # 必须在导入 app 之前设置，配置在首次读取后会被缓存
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "load-test-secret")
+
+    reset_database(args)
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "scenarios": asyncio.run(run(args)),
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)